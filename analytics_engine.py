@@ -0,0 +1,180 @@
+"""Колоночный движок аналитики продаж в памяти процесса.
+
+Дневная сводка daily_sales загружается в отсортированные массивы NumPy с накопленными
+суммами (prefix sums). Сумма за любой период — два бинарных поиска и вычитание, без
+запроса к SQLite. Новые дни дописываются в массивы при синхронизации с базой.
+"""
+import logging
+import threading
+import time
+
+import numpy as np
+
+from analytics_service import product_daily_totals_query, get_data_version
+
+logger = logging.getLogger(__name__)
+
+# Ключ строки: индекс продукта в старших битах, номер дня (от 1970-01-01) в младших
+DAY_BITS = 20
+DAY_MASK = (1 << DAY_BITS) - 1
+
+
+def day_number(value):
+    return int(np.datetime64(value, "D").astype(np.int64))
+
+
+def prefix_sum(values):
+    """Накопленные суммы с ведущим нулём: сумма values[i:j] = result[j] - result[i]."""
+    result = np.zeros(len(values) + 1)
+    np.cumsum(values, out=result[1:])
+    return result
+
+
+class SalesSnapshot:
+    """Неизменяемый срез данных движка; запросы читают его без блокировок."""
+
+    def __init__(self, product_ids, keys, quantity, revenue, days, day_quantity, day_revenue, history_version):
+        self.product_ids = product_ids          # product_id по индексу продукта (в порядке появления)
+        self.keys = keys                        # отсортированные ключи (продукт, день)
+        self.quantity = quantity
+        self.revenue = revenue
+        self.cum_quantity = prefix_sum(quantity)
+        self.cum_revenue = prefix_sum(revenue)
+        self.days = days                        # отсортированные дни с продажами
+        self.day_quantity = day_quantity
+        self.day_revenue = day_revenue
+        self.day_cum_quantity = prefix_sum(day_quantity)
+        self.day_cum_revenue = prefix_sum(day_revenue)
+        self.history_version = history_version  # версия данных дней до последнего
+
+    @property
+    def last_day(self):
+        return int(self.days[-1]) if len(self.days) else None
+
+
+class SalesAnalyticsEngine:
+    """Суммы продаж за период: итог, разбивка по продуктам и ряд по дням.
+
+    Последний загруженный день может ещё пополняться, поэтому sync() перечитывает его
+    и дописывает более поздние дни. Если изменились данные более ранних дней (версии
+    data_versions), срез перестраивается целиком.
+    """
+
+    def __init__(self):
+        self.snapshot = None
+        self.product_index = {}
+        self.lock = threading.Lock()
+
+    def load(self, session):
+        """Полностью загружает дневную сводку из базы."""
+        with self.lock:
+            started = time.perf_counter()
+            self.product_index = {}
+            self.snapshot = self.build_snapshot(session, self.fetch(session), None)
+            logger.info(
+                f"Движок аналитики: загружено {len(self.snapshot.keys)} строк продукт×день за "
+                f"{(time.perf_counter() - started) * 1000:.0f} мс"
+            )
+
+    def sync(self, session):
+        """Дописывает новые дни; возвращает число перечитанных строк продукт×день."""
+        with self.lock:
+            snapshot = self.snapshot
+            if snapshot is None or snapshot.last_day is None:
+                self.product_index = {}
+                self.snapshot = self.build_snapshot(session, self.fetch(session), None)
+                return len(self.snapshot.keys)
+            last_date = np.datetime64(snapshot.last_day, "D").item()
+            if self.history_version(session, snapshot) != snapshot.history_version:
+                logger.info("Движок аналитики: изменились данные прошлых дней, полная перезагрузка")
+                self.product_index = {}
+                self.snapshot = self.build_snapshot(session, self.fetch(session), None)
+                return len(self.snapshot.keys)
+            rows = self.fetch(session, last_date)
+            self.snapshot = self.build_snapshot(session, rows, snapshot)
+            return len(rows)
+
+    def fetch(self, session, date_from=None):
+        return product_daily_totals_query(session, date_from).all()
+
+    @staticmethod
+    def history_version(session, snapshot):
+        if snapshot.last_day is None:
+            return None
+        first = np.datetime64(int(snapshot.days[0]), "D").item()
+        before_last = np.datetime64(snapshot.last_day - 1, "D").item()
+        return get_data_version(session, first, before_last)
+
+    def build_snapshot(self, session, rows, base):
+        """Строит срез из строк (день, продукт, количество, выручка) поверх среза base.
+
+        Строки base начиная с первого дня rows заменяются; новые ключи вставляются в
+        отсортированный массив, накопленные суммы пересчитываются за один проход.
+        """
+        days = np.array([day_number(r[0]) for r in rows], dtype=np.int64)
+        pidx = np.array([self.product_index.setdefault(r[1], len(self.product_index)) for r in rows],
+                        dtype=np.int64)
+        quantity = np.array([r[2] or 0 for r in rows], dtype=float)
+        revenue = np.array([r[3] or 0.0 for r in rows], dtype=float)
+        unique_days, inverse = np.unique(days, return_inverse=True)
+        day_quantity = np.bincount(inverse, weights=quantity, minlength=len(unique_days))
+        day_revenue = np.bincount(inverse, weights=revenue, minlength=len(unique_days))
+
+        keys = (pidx << DAY_BITS) | days
+        order = np.argsort(keys)
+        keys, quantity, revenue = keys[order], quantity[order], revenue[order]
+
+        if base is not None and len(unique_days):
+            # Оставляем строки base до первого перечитанного дня и вставляем новые по ключу
+            keep = (base.keys & DAY_MASK) < unique_days[0]
+            kept_keys = base.keys[keep]
+            positions = np.searchsorted(kept_keys, keys)
+            keys = np.insert(kept_keys, positions, keys)
+            quantity = np.insert(base.quantity[keep], positions, quantity)
+            revenue = np.insert(base.revenue[keep], positions, revenue)
+            cut = np.searchsorted(base.days, unique_days[0])
+            unique_days = np.concatenate([base.days[:cut], unique_days])
+            day_quantity = np.concatenate([base.day_quantity[:cut], day_quantity])
+            day_revenue = np.concatenate([base.day_revenue[:cut], day_revenue])
+        elif base is not None:
+            return base
+
+        product_ids = np.array(sorted(self.product_index, key=self.product_index.get), dtype=np.int64)
+        snapshot = SalesSnapshot(product_ids, keys, quantity, revenue, unique_days, day_quantity, day_revenue, None)
+        snapshot.history_version = self.history_version(session, snapshot)
+        return snapshot
+
+    def day_range(self, snapshot, date_from, date_to):
+        lo = np.searchsorted(snapshot.days, day_number(date_from), side="left")
+        hi = np.searchsorted(snapshot.days, day_number(date_to), side="right")
+        return lo, hi
+
+    def total(self, date_from, date_to):
+        """(количество, выручка) за период."""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return 0.0, 0.0
+        lo, hi = self.day_range(snapshot, date_from, date_to)
+        return (snapshot.day_cum_quantity[hi] - snapshot.day_cum_quantity[lo],
+                snapshot.day_cum_revenue[hi] - snapshot.day_cum_revenue[lo])
+
+    def product_totals(self, date_from, date_to):
+        """(product_ids, количество, выручка) за период по всем продуктам одним векторным поиском."""
+        snapshot = self.snapshot
+        if snapshot is None or not len(snapshot.product_ids):
+            return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+        base = np.arange(len(snapshot.product_ids), dtype=np.int64) << DAY_BITS
+        lo = np.searchsorted(snapshot.keys, base | day_number(date_from), side="left")
+        hi = np.searchsorted(snapshot.keys, base | day_number(date_to), side="right")
+        return (snapshot.product_ids,
+                snapshot.cum_quantity[hi] - snapshot.cum_quantity[lo],
+                snapshot.cum_revenue[hi] - snapshot.cum_revenue[lo])
+
+    def daily_totals(self, date_from, date_to):
+        """(даты, количество, выручка) по дням периода, в которые были продажи."""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return [], np.empty(0), np.empty(0)
+        lo, hi = self.day_range(snapshot, date_from, date_to)
+        dates = snapshot.days[lo:hi].astype("datetime64[D]").tolist()
+        return dates, snapshot.day_quantity[lo:hi], snapshot.day_revenue[lo:hi]
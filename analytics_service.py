@@ -0,0 +1,151 @@
+from sqlalchemy import func
+from data_simulator import DailySales, Product, Client, SalesPlan, DataVersion
+
+
+def sales_details_query(session, date_from, date_to):
+    """Продажи по дате, продукту и клиенту из дневной сводки daily_sales."""
+    return (
+        session.query(
+            DailySales.sale_date,
+            Product.name,
+            Client.name,
+            DailySales.quantity,
+            DailySales.revenue
+        )
+        .join(Product, DailySales.product_id == Product.id)
+        .join(Client, DailySales.client_id == Client.id)
+        .filter(DailySales.sale_date >= date_from)
+        .filter(DailySales.sale_date <= date_to)
+        .order_by(DailySales.sale_date)
+    )
+
+
+def daily_totals_query(session, date_from, date_to, after=None):
+    """Количество и сумма продаж по дням периода; after — последняя уже загруженная дата."""
+    query = (
+        session.query(
+            DailySales.sale_date.label("key"),
+            DailySales.sale_date.label("label"),
+            func.sum(DailySales.quantity).label("quantity"),
+            func.sum(DailySales.revenue).label("revenue")
+        )
+        .filter(DailySales.sale_date >= date_from)
+        .filter(DailySales.sale_date <= date_to)
+    )
+    if after is not None:
+        query = query.filter(DailySales.sale_date > after)
+    return query.group_by(DailySales.sale_date).order_by(DailySales.sale_date)
+
+
+def product_totals_query(session, sale_date, after=None):
+    """Количество и сумма продаж по продуктам за день; after — последний загруженный product_id."""
+    query = (
+        session.query(
+            DailySales.product_id.label("key"),
+            Product.name.label("label"),
+            func.sum(DailySales.quantity).label("quantity"),
+            func.sum(DailySales.revenue).label("revenue")
+        )
+        .join(Product, DailySales.product_id == Product.id)
+        .filter(DailySales.sale_date == sale_date)
+    )
+    if after is not None:
+        query = query.filter(DailySales.product_id > after)
+    return query.group_by(DailySales.product_id).order_by(DailySales.product_id)
+
+
+def client_sales_query(session, sale_date, product_id, after=None):
+    """Продажи продукта за день по клиентам; after — последний загруженный client_id."""
+    query = (
+        session.query(
+            DailySales.client_id.label("key"),
+            Client.name.label("label"),
+            DailySales.quantity,
+            DailySales.revenue
+        )
+        .join(Client, DailySales.client_id == Client.id)
+        .filter(DailySales.sale_date == sale_date)
+        .filter(DailySales.product_id == product_id)
+    )
+    if after is not None:
+        query = query.filter(DailySales.client_id > after)
+    return query.order_by(DailySales.client_id)
+
+
+def product_daily_totals_query(session, date_from=None):
+    """Количество и выручка по дням и продуктам, начиная с date_from (по умолчанию вся история)."""
+    query = session.query(
+        DailySales.sale_date,
+        DailySales.product_id,
+        func.sum(DailySales.quantity),
+        func.sum(DailySales.revenue)
+    )
+    if date_from is not None:
+        query = query.filter(DailySales.sale_date >= date_from)
+    return query.group_by(DailySales.sale_date, DailySales.product_id)
+
+
+def plan_totals_query(session, date_from, date_to):
+    """Суммы прогноза и плана по датам (без группировки по продуктам)."""
+    return (
+        session.query(
+            SalesPlan.plan_date,
+            func.sum(SalesPlan.forecast_quantity).label('forecast_sum'),
+            func.sum(SalesPlan.planned_quantity).label('plan_sum')
+        )
+        .filter(SalesPlan.plan_date >= date_from)
+        .filter(SalesPlan.plan_date <= date_to)
+        .group_by(SalesPlan.plan_date)
+    )
+
+
+def data_version_query(session, date_from, date_to):
+    """Версия данных периода: число дат с версией и сумма их версий.
+
+    Версии дат только растут, поэтому пара меняется при любой записи в период.
+    """
+    return (
+        session.query(func.count(DataVersion.version_date), func.coalesce(func.sum(DataVersion.version), 0))
+        .filter(DataVersion.version_date >= date_from)
+        .filter(DataVersion.version_date <= date_to)
+    )
+
+
+def get_data_version(session, date_from, date_to):
+    return tuple(data_version_query(session, date_from, date_to).one())
+
+
+def build_report_data(session, date_from, date_to, engine=None):
+    """Собирает данные отчёта: итоги по датам по столбцам и ряды для графика.
+
+    summary_columns — список столбцов одинаковой длины; строки таблицы из них не собираются,
+    форматирование выполняет модель таблицы при отображении. Детализация по продуктам и
+    клиентам загружается отдельно, по мере раскрытия дней в дереве.
+    Если передан движок аналитики в памяти, суммы продаж по дням берутся из него.
+    """
+    if engine is not None:
+        engine.sync(session)
+        sale_dates, _, revenue = engine.daily_totals(date_from, date_to)
+        sales_by_date = dict(zip(sale_dates, revenue.tolist()))
+    else:
+        sales_by_date = {r.key: r.revenue for r in daily_totals_query(session, date_from, date_to)}
+    plan_results = plan_totals_query(session, date_from, date_to).all()
+    forecast_by_date = {r.plan_date: r.forecast_sum for r in plan_results}
+    plan_by_date = {r.plan_date: r.plan_sum for r in plan_results}
+
+    # Итоги по всем датам с продажами или планами
+    dates = sorted(set(sales_by_date) | set(forecast_by_date))
+    totals = [sales_by_date.get(d, 0) for d in dates]
+    forecast_values = [forecast_by_date.get(d, 0) for d in dates]
+    plan_values = [plan_by_date.get(d, 0) for d in dates]
+    completion = [(total / plan) * 100 if plan > 0 else "-" for total, plan in zip(totals, plan_values)]
+
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "summary_columns": [dates, totals, forecast_values, plan_values, completion],
+        "dates": dates,
+        "totals": totals,
+        "forecast_values": forecast_values,
+        "plan_values": plan_values,
+    }
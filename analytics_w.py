@@ -1,19 +1,235 @@
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QDateEdit,
-    QPushButton, QTableWidget, QTableWidgetItem, QHeaderView, QSplitter
+    QPushButton, QTableView, QTreeView, QHeaderView, QSplitter, QMessageBox, QFileDialog
 )
-from PyQt6.QtCore import QDate, Qt
+from PyQt6.QtCore import QDate, QObject, QThread, QTimer, Qt, QCoreApplication, pyqtSignal
+import logging
+import threading
+from sqlalchemy.exc import OperationalError
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
-from sqlalchemy import func
-from data_simulator import Order, OrderItem, Product, Client, SalesPlan
+from analytics_service import build_report_data, get_data_version
+from data_simulator import Session, writer_busy
+from drilldown_model import DrillDownModel
+from export_service import ExportCancelled, default_export_format, export_data
+from report_cache import ReportCache
+from report_chart import ReportChart
+from table_models import ColumnarTableModel, format_date, format_money, format_percent
+
+TABLE_STYLE = """
+QTableView, QTreeView {
+    gridline-color: #26a69a;
+    font-size: 10pt;
+    color: #004d40;
+    border: none;
+    background-color: #ffffff;
+    alternate-background-color: #f9f9f9;
+    selection-background-color: #e0f2f1;
+    selection-color: #80cbc4;
+}
+QHeaderView::section {
+    background-color: #26a69a;
+    color: white;
+    padding: 6px;
+    font-weight: bold;
+    border: none;
+    border-top-left-radius: 2px;
+}
+QScrollBar:vertical {
+    background: #f0f0f0;
+    width: 10px;
+    margin: 2px 0;
+    border-radius: 5px;
+}
+QScrollBar::handle:vertical {
+    background: #b2dfdb;
+    border-radius: 5px;
+    min-height: 20px;
+}
+QScrollBar::handle:vertical:hover {
+    background: #26a69a;
+}
+QScrollBar::add-line:vertical,
+QScrollBar::sub-line:vertical {
+    height: 0px;
+    subcontrol-origin: margin;
+}
+QScrollBar::add-page:vertical,
+QScrollBar::sub-page:vertical {
+    background: none;
+}
+"""
+
+# Пауза после последнего запроса отчёта перед его построением
+REPORT_DEBOUNCE_MS = 150
+
+logger = logging.getLogger(__name__)
+
+
+class ReportWorker(QObject):
+    """Строит данные отчёта в фоновом потоке.
+
+    Выполняется только последний запрошенный отчёт: запросы, устаревшие к моменту
+    начала, пропускаются, а выполняющийся устаревший запрос к базе прерывается.
+    Отчёты за периоды, данные которых не менялись, берутся из кэша.
+    """
+
+    ready = pyqtSignal(int, object)   # номер запроса, данные отчёта
+    failed = pyqtSignal(int, str)
+
+    def __init__(self, cache, engine=None):
+        super().__init__()
+        self.cache = cache
+        self.engine = engine
+        self.latest_request = 0
+        self.lock = threading.Lock()
+        self.connection = None
+
+    def request(self, request_id):
+        """Вызывается из потока интерфейса: отмечает запрос последним и прерывает текущий."""
+        with self.lock:
+            self.latest_request = request_id
+            if self.connection is not None:
+                self.connection.interrupt()
+
+    def is_stale(self, request_id):
+        return request_id != self.latest_request
+
+    def build(self, request_id, date_from, date_to):
+        if self.is_stale(request_id):
+            return
+        # Сессия SQLAlchemy не потокобезопасна, поэтому у потока своя сессия
+        session = Session()
+        try:
+            with self.lock:
+                self.connection = session.connection().connection.dbapi_connection
+            # Версия читается до данных: изменения между запросами не попадут в кэш под старой версией
+            version = get_data_version(session, date_from, date_to)
+            data = self.cache.get((date_from, date_to), version)
+            if data is None:
+                data = build_report_data(session, date_from, date_to, self.engine)
+                self.cache.put((date_from, date_to), version, data)
+        except OperationalError as e:
+            if self.is_stale(request_id):
+                logger.debug(f"Построение отчёта {request_id} прервано")
+            else:
+                logger.error(f"Ошибка построения отчёта: {str(e)}")
+                self.failed.emit(request_id, str(e))
+            return
+        except Exception as e:
+            logger.error(f"Ошибка построения отчёта: {str(e)}")
+            self.failed.emit(request_id, str(e))
+            return
+        finally:
+            with self.lock:
+                self.connection = None
+            session.close()
+        if not self.is_stale(request_id):
+            self.ready.emit(request_id, data)
+
+
+class ReportPrefetcher(QObject):
+    """Заранее строит в кэш отчёты за соседние периоды в отдельном фоновом потоке.
+
+    Предвыборка прекращается, когда пользователь запрашивает другой отчёт, и не
+    выполняется, пока симулятор записывает данные.
+    """
+
+    def __init__(self, cache, engine=None):
+        super().__init__()
+        self.cache = cache
+        self.engine = engine
+        self.latest_request = 0
+
+    def request(self, request_id):
+        """Вызывается из потока интерфейса: предвыборка для прежних запросов прекращается."""
+        self.latest_request = request_id
+
+    def prefetch(self, request_id, periods):
+        session = Session()
+        try:
+            for date_from, date_to in periods:
+                if request_id != self.latest_request:
+                    return
+                if writer_busy.is_set():
+                    logger.debug("Предвыборка отчётов остановлена: симулятор записывает данные")
+                    return
+                version = get_data_version(session, date_from, date_to)
+                if self.cache.contains((date_from, date_to), version):
+                    continue
+                data = build_report_data(session, date_from, date_to, self.engine)
+                self.cache.put((date_from, date_to), version, data, prefetched=True)
+                logger.debug(f"Предвыборка отчёта за {date_from} — {date_to}")
+        except OperationalError as e:
+            # Например, база заблокирована записью: следующий переход запустит предвыборку снова
+            logger.debug(f"Предвыборка отчётов прервана: {str(e)}")
+        except Exception as e:
+            logger.error(f"Ошибка предвыборки отчётов: {str(e)}")
+        finally:
+            session.close()
+
+
+class ExportWorker(QObject):
+    """Выгружает данные за период в файлы в фоновом потоке."""
+
+    progress = pyqtSignal(str, int)   # набор данных, выгружено строк
+    finished = pyqtSignal(object)     # {набор: (строк, секунд)}
+    failed = pyqtSignal(str)
+
+    def __init__(self, date_from, date_to, out_dir, export_format):
+        super().__init__()
+        self.date_from = date_from
+        self.date_to = date_to
+        self.out_dir = out_dir
+        self.export_format = export_format
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def on_progress(self, dataset, rows):
+        # Вызывается после каждой записанной порции: отмена срабатывает между порциями
+        if self.cancel_event.is_set():
+            raise ExportCancelled()
+        self.progress.emit(dataset, rows)
+
+    def run(self):
+        session = Session()
+        try:
+            stats = export_data(
+                session, self.date_from, self.date_to, self.out_dir, self.export_format,
+                on_progress=self.on_progress
+            )
+        except ExportCancelled:
+            logger.info("Выгрузка прервана")
+        except Exception as e:
+            logger.error(f"Ошибка выгрузки: {str(e)}")
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(stats)
+        finally:
+            session.close()
 
 
 class AnalyticsWidget(QWidget):
-    def __init__(self, session, parent=None):
+    report_requested = pyqtSignal(int, object, object)   # номер запроса, начало и конец периода
+    prefetch_requested = pyqtSignal(int, object)         # номер запроса, список периодов
+
+    def __init__(self, session, parent=None, report_cache=None, analytics_engine=None):
         super().__init__(parent)
         self.session = session
+        self.report_cache = report_cache if report_cache is not None else ReportCache()
+        # Движок аналитики в памяти (SalesAnalyticsEngine) или None — суммы из базы
+        self.analytics_engine = analytics_engine
+        self.report_seq = 0
+        self.prefetch_periods = []
+        # Перечитать ли дерево детализации: следующим запросом и запросом report_seq
+        self.reset_details = False
+        self.report_reset_details = False
+        self.export_worker = None
+        self.export_thread = None
         self.init_ui()
+        self.init_report_worker()
 
     def init_ui(self):
         main_layout = QVBoxLayout(self)
@@ -94,25 +310,34 @@ class AnalyticsWidget(QWidget):
         self.btn_build.clicked.connect(self.build_report)
         filter_layout.addWidget(self.btn_build)
 
+        self.btn_export = QPushButton("Выгрузить…")
+        self.btn_export.setStyleSheet(self.btn_build.styleSheet())
+        self.btn_export.clicked.connect(self.export_period)
+        filter_layout.addWidget(self.btn_export)
+
         filter_layout.addStretch()
         main_layout.addLayout(filter_layout)
 
         # --- График (сначала) ---
         self.figure = Figure(figsize=(5, 3))
         self.canvas = FigureCanvas(self.figure)
+        self.chart = ReportChart(self.figure, self.canvas)
         main_layout.addWidget(self.canvas)
 
         splitter = QSplitter(Qt.Orientation.Horizontal)
 
-        self.table_summary = QTableWidget()
-        self.table_summary.setColumnCount(5)
-        self.table_summary.setHorizontalHeaderLabels(["Дата", "Сумма продаж (₽)", "Прогноз (₽)", "План (₽)", "% выполнения"])
-        self.table_summary.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.summary_model = ColumnarTableModel(
+            ["Дата", "Сумма продаж (₽)", "Прогноз (₽)", "План (₽)", "% выполнения"],
+            [format_date, format_money, format_money, format_money, format_percent]
+        )
+        self.table_summary = self.create_table_view(self.summary_model)
 
-        self.table_details = QTableWidget()
-        self.table_details.setColumnCount(5)
-        self.table_details.setHorizontalHeaderLabels(["Дата", "Продукт", "Клиент", "Количество", "Сумма"])
-        self.table_details.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.details_model = DrillDownModel(self.session)
+        self.table_details = QTreeView()
+        self.table_details.setModel(self.details_model)
+        self.table_details.setUniformRowHeights(True)
+        self.table_details.header().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.table_details.setStyleSheet(TABLE_STYLE)
 
         splitter.addWidget(self.table_summary)
         splitter.addWidget(self.table_details)
@@ -120,218 +345,151 @@ class AnalyticsWidget(QWidget):
 
         main_layout.addWidget(splitter)
 
+    def create_table_view(self, model):
+        table = QTableView()
+        table.setModel(model)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        # Фиксированная высота строк: представлению не нужно измерять строки при прокрутке
+        table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        table.setStyleSheet(TABLE_STYLE)
+        return table
+
+    def init_report_worker(self):
+        # Частые запросы (перелистывание периодов) объединяются в один
+        self.report_timer = QTimer(self)
+        self.report_timer.setSingleShot(True)
+        self.report_timer.setInterval(REPORT_DEBOUNCE_MS)
+        self.report_timer.timeout.connect(self.submit_report)
+
+        self.report_worker = ReportWorker(self.report_cache, self.analytics_engine)
+        self.report_thread = QThread(self)
+        self.report_worker.moveToThread(self.report_thread)
+        self.report_requested.connect(self.report_worker.build)
+        self.report_worker.ready.connect(self.on_report_ready)
+        self.report_worker.failed.connect(self.on_report_failed)
+        self.report_thread.finished.connect(self.report_worker.deleteLater)
+
+        self.report_prefetcher = ReportPrefetcher(self.report_cache, self.analytics_engine)
+        self.prefetch_thread = QThread(self)
+        self.report_prefetcher.moveToThread(self.prefetch_thread)
+        self.prefetch_requested.connect(self.report_prefetcher.prefetch)
+        self.prefetch_thread.finished.connect(self.report_prefetcher.deleteLater)
+
+        QCoreApplication.instance().aboutToQuit.connect(self.stop_report_worker)
+        self.report_thread.start()
+        self.prefetch_thread.start()
+
+    def stop_report_worker(self):
+        self.report_worker.request(-1)
+        self.report_prefetcher.request(-1)
+        for thread in (self.report_thread, self.prefetch_thread):
+            thread.quit()
+            thread.wait()
+        if self.export_thread is not None:
+            self.export_worker.cancel()
+            self.export_thread.quit()
+            self.export_thread.wait()
+        self.report_cache.log_stats()
+
     def build_report(self):
-        import matplotlib.pyplot as plt  # Импорт для форматирования графика
-
-        date_from = self.date_from.date().toPyDate()
-        date_to = self.date_to.date().toPyDate()
-
-        # Запрос продаж по дате, продукту и клиенту, с суммой по строке (цена*количество)
-        query = (
-            self.session.query(
-                Order.order_date,
-                Product.name,
-                Client.name,
-                OrderItem.quantity,
-                func.sum(OrderItem.quantity * OrderItem.price).label('line_total')
-            )
-            .join(OrderItem.order)
-            .join(OrderItem.product)
-            .join(Order.client)
-            .filter(Order.order_date >= date_from)
-            .filter(Order.order_date <= date_to)
-            .group_by(Order.order_date, Product.name, Client.name)
-            .order_by(Order.order_date)
+        """Запрашивает отчёт за выбранный период; строится последний запрос после паузы."""
+        self.prefetch_periods = []
+        self.reset_details = True
+        self.report_timer.start()
+
+    def refresh_report(self):
+        """Перестраивает текущий отчёт после изменения данных, сохраняя периоды предвыборки."""
+        if not self.report_timer.isActive():
+            self.report_timer.start()
+
+    def apply_changes(self, batch):
+        """Применяет пачку изменений данных (ChangeBatch) к показанному отчёту.
+
+        Новые заказы прибавляются к загруженным строкам детализации, сводка и график
+        перестраиваются, только если заказы попали в показанный период.
+        """
+        date_from, date_to = self.details_model.date_from, self.details_model.date_to
+        if date_from is None or not batch.touches_period(date_from, date_to):
+            return
+        self.details_model.apply_orders(batch.orders)
+        self.refresh_report()
+
+    def set_prefetch_periods(self, periods):
+        """Периоды [(date_from, date_to), ...], которые стоит построить после текущего отчёта."""
+        self.prefetch_periods = list(periods)
+
+    def submit_report(self):
+        self.report_seq += 1
+        self.report_reset_details, self.reset_details = self.reset_details, False
+        self.report_worker.request(self.report_seq)
+        self.report_prefetcher.request(self.report_seq)
+        self.report_requested.emit(
+            self.report_seq, self.date_from.date().toPyDate(), self.date_to.date().toPyDate()
         )
 
-        results = query.all()
-
-        # Запрос планов (без группировки по категориям, сумма по датам)
-        plan_query = (
-            self.session.query(
-                SalesPlan.plan_date,
-                func.sum(SalesPlan.forecast_quantity).label('forecast_sum'),
-                func.sum(SalesPlan.planned_quantity).label('plan_sum')
-            )
-            .filter(SalesPlan.plan_date >= date_from)
-            .filter(SalesPlan.plan_date <= date_to)
-            .group_by(SalesPlan.plan_date)
+    def on_report_ready(self, request_id, data):
+        if request_id == self.report_seq:
+            self.apply_report(data, self.report_reset_details)
+            # Соседние периоды строятся, пока пользователь смотрит на текущий
+            if self.prefetch_periods:
+                self.prefetch_requested.emit(request_id, self.prefetch_periods)
+
+    def on_report_failed(self, request_id, message):
+        if request_id == self.report_seq:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось построить отчёт: {message}")
+
+    def export_period(self):
+        """Выгружает строки заказов, дневную сводку и планы за выбранный период в каталог."""
+        out_dir = QFileDialog.getExistingDirectory(self, "Каталог для выгрузки")
+        if not out_dir:
+            return
+        export_format = default_export_format()
+        self.export_worker = ExportWorker(
+            self.date_from.date().toPyDate(), self.date_to.date().toPyDate(), out_dir, export_format
         )
-
-        plan_results = plan_query.all()
-        forecast_by_date = {r.plan_date: r.forecast_sum for r in plan_results}
-        plan_by_date = {r.plan_date: r.plan_sum for r in plan_results}
-
-        sales_by_date = {}
-        summary_rows = {}
-        details_rows = []
-
-        # Обработка результатов продаж
-        for order_date, product_name, client_name, quantity, line_total in results:
-            # подсчет суммы продаж по дате
-            sales_by_date[order_date] = sales_by_date.get(order_date, 0) + line_total
-            forecast = forecast_by_date.get(order_date, 0)
-            plan = plan_by_date.get(order_date, 0)
-            if plan > 0:
-                completion = (sales_by_date[order_date] / plan) * 100
-            else:
-                completion = "-"
-            summary_rows[order_date] = [order_date, sales_by_date[order_date], forecast, plan, completion]
-            # Для детализации выводим каждую строку заказа с ценой * количеством
-            details_rows.append([order_date, product_name, client_name, quantity, line_total])
-
-        # Обработка дат из планов, которых нет в продажах
-        for date_key in forecast_by_date:
-            if date_key not in summary_rows:
-                plan_val = plan_by_date.get(date_key, 0)
-                if plan_val > 0:
-                    completion = (0 / plan_val) * 100
-                else:
-                    completion = "-"
-                summary_rows[date_key] = [date_key, 0, forecast_by_date[date_key], plan_val, completion]
-
-        # Обновляем таблицу с итогами
-        self.table_summary.setRowCount(0)
-        self.table_summary.setStyleSheet("""
-            QTableWidget {
-                gridline-color: #26a69a;
-                font-size: 10pt;
-                color: #004d40;
-                border: none;
-                background-color: #ffffff;
-                alternate-background-color: #f9f9f9;
-                selection-background-color: #e0f2f1;
-                selection-color: #80cbc4;
-            }
-            QHeaderView::section {
-                background-color: #26a69a;
-                color: white;
-                padding: 6px;
-                font-weight: bold;
-                border: none;
-                border-top-left-radius: 2px;
-            }
-            QScrollBar:vertical {
-                background: #f0f0f0;
-                width: 10px;
-                margin: 2px 0;
-                border-radius: 5px;
-            }
-            QScrollBar::handle:vertical {
-                background: #b2dfdb;
-                border-radius: 5px;
-                min-height: 20px;
-            }
-            QScrollBar::handle:vertical:hover {
-                background: #26a69a;
-            }
-            QScrollBar::add-line:vertical,
-            QScrollBar::sub-line:vertical {
-                height: 0px;
-                subcontrol-origin: margin;
-            }
-            QScrollBar::add-page:vertical,
-            QScrollBar::sub-page:vertical {
-                background: none;
-            }
-        """)
-
-        for row_data in sorted(summary_rows.values(), key=lambda x: x[0]):
-            row = self.table_summary.rowCount()
-            self.table_summary.insertRow(row)
-            for col, val in enumerate(row_data):
-                if col == 0:
-                    item = QTableWidgetItem(val.strftime("%d.%m.%y"))
-                elif col == 4:
-                    item = QTableWidgetItem(f"{val:.2f}%" if isinstance(val, (float, int)) else str(val))
-                else:
-                    item = QTableWidgetItem(f"{val:.2f}")
-                self.table_summary.setItem(row, col, item)
-
-        # Обработка деталей
-        self.table_details.setRowCount(0)
-        self.table_details.setStyleSheet("""
-            QTableWidget {
-                gridline-color: #26a69a;
-                font-size: 10pt;
-                color: #004d40;
-                border: none;
-                background-color: #ffffff;
-                alternate-background-color: #f9f9f9;
-                selection-background-color: #e0f2f1;
-                selection-color: #80cbc4;
-            }
-            QHeaderView::section {
-                background-color: #26a69a;
-                color: white;
-                padding: 6px;
-                font-weight: bold;
-                border: none;
-                border-top-left-radius: 2px;
-            }
-            QScrollBar:vertical {
-                background: #f0f0f0;
-                width: 10px;
-                margin: 2px 0;
-                border-radius: 5px;
-            }
-            QScrollBar::handle:vertical {
-                background: #b2dfdb;
-                border-radius: 5px;
-                min-height: 20px;
-            }
-            QScrollBar::handle:vertical:hover {
-                background: #26a69a;
-            }
-            QScrollBar::add-line:vertical,
-            QScrollBar::sub-line:vertical {
-                height: 0px;
-                subcontrol-origin: margin;
-            }
-            QScrollBar::add-page:vertical,
-            QScrollBar::sub-page:vertical {
-                background: none;
-            }
-        """)
-
-        for row_data in details_rows:
-            row = self.table_details.rowCount()
-            self.table_details.insertRow(row)
-            for col, val in enumerate(row_data):
-                if col == 0:
-                    item = QTableWidgetItem(val.strftime("%d.%m.%y"))
-                elif col == 4:
-                    item = QTableWidgetItem(f"{val:.2f}")
-                else:
-                    item = QTableWidgetItem(str(val))
-                self.table_details.setItem(row, col, item)
-
-        # Построение графика
-        self.figure.clear()
-        ax = self.figure.add_subplot(111)
-
-        dates = sorted(set(list(sales_by_date.keys()) + list(forecast_by_date.keys())))
-        date_labels = [d.strftime("%d.%m.%y") for d in dates]
-        totals = [sales_by_date.get(d, 0) for d in dates]
-        forecast_values = [forecast_by_date.get(d, 0) for d in dates]
-        plan_values = [plan_by_date.get(d, 0) for d in dates]
-
-        # Форматирование оси Y
-        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, _: f'{x:.2f}'))
-
-        ax.bar(date_labels, totals, color="#80cbc4", edgecolor="#004d40", linewidth=1.2, alpha=0.9, label="Продажи (₽)")
-        ax.plot(date_labels, forecast_values, color="#004d40", linestyle="--", linewidth=2, marker='s', markersize=3,
-                label="Прогноз спроса (₽)")
-        ax.plot(date_labels, plan_values, color="#26a69a", linestyle="-.", linewidth=2, marker='^', markersize=3,
-                label="План продаж (₽)")
-
-        ax.set_title("Сумма продаж, прогноз и план", fontsize=11, color="#004d40", fontweight='bold')
-        ax.tick_params(axis='x', rotation=45, labelsize=7, colors="#004d40")
-        ax.tick_params(axis='y', labelsize=7, colors="#004d40")
-        ax.legend(facecolor='white', edgecolor='lightgray', fontsize=8)
-        ax.grid(True, linestyle='--', alpha=0.5)
-        for spine in ax.spines.values():
-            spine.set_edgecolor("#26a69a")
-
-        self.figure.tight_layout()
-        self.canvas.draw()
\ No newline at end of file
+        self.export_thread = QThread(self)
+        self.export_worker.moveToThread(self.export_thread)
+        self.export_thread.started.connect(self.export_worker.run)
+        self.export_worker.progress.connect(self.on_export_progress)
+        self.export_worker.finished.connect(self.on_export_finished)
+        self.export_worker.failed.connect(self.on_export_failed)
+        self.export_worker.finished.connect(self.export_thread.quit)
+        self.export_worker.failed.connect(self.export_thread.quit)
+        self.export_thread.finished.connect(self.on_export_thread_finished)
+        self.export_thread.finished.connect(self.export_worker.deleteLater)
+        self.export_thread.finished.connect(self.export_thread.deleteLater)
+        self.btn_export.setEnabled(False)
+        self.export_thread.start()
+
+    def on_export_thread_finished(self):
+        self.export_worker = None
+        self.export_thread = None
+
+    def on_export_progress(self, dataset, rows):
+        self.btn_export.setText(f"{dataset}: {rows}")
+
+    def on_export_finished(self, stats):
+        self.reset_export_button()
+        lines = [
+            f"{name}: {rows} строк, {rows / seconds if seconds else 0:.0f} строк/с"
+            for name, (rows, seconds) in stats.items()
+        ]
+        QMessageBox.information(self, "Выгрузка", "Данные выгружены:\n" + "\n".join(lines))
+
+    def on_export_failed(self, message):
+        self.reset_export_button()
+        QMessageBox.critical(self, "Ошибка", f"Не удалось выгрузить данные: {message}")
+
+    def reset_export_button(self):
+        self.btn_export.setText("Выгрузить…")
+        self.btn_export.setEnabled(True)
+
+    def apply_report(self, data, reset_details=True):
+        # Таблицы только сбрасывают модели, ячейки форматируются при отображении
+        self.summary_model.set_columns(data["summary_columns"])
+        # Обновление по ленте изменений (refresh_report) того же периода не перечитывает дерево
+        # детализации: новые заказы в него уже добавил apply_changes
+        period = (data["date_from"], data["date_to"])
+        if reset_details or (self.details_model.date_from, self.details_model.date_to) != period:
+            self.details_model.set_period(data["date_from"], data["date_to"])
+        self.chart.update(data["dates"], data["totals"], data["forecast_values"], data["plan_values"])
@@ -0,0 +1,75 @@
+"""Лента изменений данных внутри процесса.
+
+Код записи (симулятор, генератор нагрузки) после фиксации транзакции публикует
+типизированные события: новый заказ со строками, изменение остатка продукта, новую
+маркетинговую акцию. Подписчики вызываются в потоке писателя, поэтому должны только
+сохранить события; доставку в поток интерфейса пачками выполняет change_signals.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class OrderInserted:
+    order_id: int
+    order_date: date
+    client_id: int
+    items: tuple        # ((product_id, quantity, price), ...), price — сумма строки
+
+
+@dataclass(frozen=True)
+class StockDelta:
+    product_id: int
+    delta: int
+    stock_quantity: int   # остаток после изменения
+
+
+@dataclass(frozen=True)
+class ActivityCreated:
+    activity_id: int
+    name: str
+    start_date: date
+    end_date: date
+    product_ids: tuple
+
+
+class ChangeFeed:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = []
+
+    def subscribe(self, callback):
+        """callback(events, published_at) вызывается в потоке писателя после каждой публикации.
+
+        published_at — time.monotonic() после фиксации транзакции: данные, прочитанные
+        позже этого момента, уже содержат изменения.
+        """
+        with self.lock:
+            self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self.lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def publish(self, events):
+        """Передаёт подписчикам события зафиксированной транзакции."""
+        if not events:
+            return
+        published_at = time.monotonic()
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for callback in subscribers:
+            try:
+                callback(events, published_at)
+            except Exception as e:
+                # Ошибка подписчика не должна прерывать запись данных
+                logger.error(f"Ошибка обработчика ленты изменений: {e}")
+
+
+change_feed = ChangeFeed()
@@ -0,0 +1,66 @@
+import threading
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from change_feed import change_feed, OrderInserted, StockDelta, ActivityCreated
+from settings import CHANGE_FEED_INTERVAL_MS
+
+
+class ChangeBatch:
+    """Изменения за интервал доставки, сгруппированные по типу.
+
+    orders — [(published_at, OrderInserted), ...] в порядке публикации; время нужно, чтобы
+    не прибавлять заказ к данным, прочитанным из базы уже после его записи.
+    """
+
+    def __init__(self, events):
+        self.orders = [(t, e) for t, e in events if isinstance(e, OrderInserted)]
+        self.activities = [e for _, e in events if isinstance(e, ActivityCreated)]
+        # Изменения остатка одного продукта складываются, остаток берётся последний
+        self.stock = {}
+        for _, e in events:
+            if isinstance(e, StockDelta):
+                previous = self.stock.get(e.product_id)
+                delta = e.delta + (previous.delta if previous else 0)
+                self.stock[e.product_id] = StockDelta(e.product_id, delta, e.stock_quantity)
+        self.dates = {order.order_date for _, order in self.orders}
+
+    def touches_period(self, date_from, date_to):
+        return any(date_from <= d <= date_to for d in self.dates)
+
+
+class ChangeBatcher(QObject):
+    """Доставляет события ленты изменений в поток интерфейса пачками.
+
+    События от писателя только накапливаются; таймер в потоке интерфейса раз в interval_ms
+    отправляет накопленное одним сигналом changed(ChangeBatch). Так частота обновления
+    виджетов не зависит от скорости записи.
+    """
+
+    changed = pyqtSignal(object)
+
+    def __init__(self, feed=change_feed, interval_ms=CHANGE_FEED_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self.feed = feed
+        self.lock = threading.Lock()
+        self.pending = []
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.flush)
+        self.feed.subscribe(self.on_events)
+        self.timer.start()
+
+    def on_events(self, events, published_at):
+        # Вызывается в потоке писателя
+        with self.lock:
+            self.pending.extend((published_at, event) for event in events)
+
+    def flush(self):
+        with self.lock:
+            events, self.pending = self.pending, []
+        if events:
+            self.changed.emit(ChangeBatch(events))
+
+    def stop(self):
+        self.feed.unsubscribe(self.on_events)
+        self.timer.stop()
@@ -0,0 +1,65 @@
+"""Выгрузка строк заказов, дневной сводки и планов продаж за период в Parquet или CSV.
+
+Пример запуска:
+    python -m data_export --from 2025-01-01 --to 2025-12-31 --format parquet --out-dir export
+"""
+import argparse
+import logging
+import sys
+from datetime import date, datetime, timedelta
+
+from data_simulator import Session, migrate_database
+from export_service import (
+    DATASETS, EXPORT_FORMATS, ExportError, default_export_format, export_data, max_plan_date
+)
+
+logger = logging.getLogger("data_export")
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Выгрузка данных продаж и планов в Parquet или CSV")
+    parser.add_argument("--from", dest="date_from", type=parse_date, default=date.today() - timedelta(days=365),
+                        help="начало периода в формате ГГГГ-ММ-ДД (по умолчанию год назад)")
+    parser.add_argument("--to", dest="date_to", type=parse_date, default=None,
+                        help="конец периода в формате ГГГГ-ММ-ДД (по умолчанию сегодня, а при выгрузке "
+                             "sales_plan — последняя дата плана, если она позже)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default=default_export_format(),
+                        help="формат файлов (Parquet требует pyarrow)")
+    parser.add_argument("--datasets", nargs="+", choices=list(DATASETS), default=list(DATASETS))
+    parser.add_argument("--out-dir", default="export", help="каталог для файлов выгрузки")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="строк в одной порции чтения и записи")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    migrate_database()
+    session = Session()
+    try:
+        if args.date_to is None:
+            # Планы продаж строятся на будущие даты: период по умолчанию охватывает весь горизонт плана
+            args.date_to = date.today()
+            if "sales_plan" in args.datasets:
+                args.date_to = max(args.date_to, max_plan_date(session) or args.date_to)
+        stats = export_data(
+            session, args.date_from, args.date_to, args.out_dir, args.format, args.datasets, args.chunk_size
+        )
+    except ExportError as e:
+        logger.error(f"Выгрузка не выполнена: {e}")
+        return 1
+    finally:
+        session.close()
+
+    rows = sum(count for count, _ in stats.values())
+    elapsed = sum(seconds for _, seconds in stats.values())
+    logger.info(f"Выгружено {rows} строк за {elapsed:.2f} с ({rows / elapsed if elapsed else 0:.0f} строк/с)")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(main())
@@ -1,10 +1,18 @@
+import json
 import random
 import threading
 import time
 from datetime import date, timedelta
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, Date, ForeignKey
-from sqlalchemy.orm import declarative_base, sessionmaker, relationship
+from sqlalchemy import (
+    select, func, delete, update, cast, Column, Integer, String, Float, Boolean, Date, ForeignKey, Index
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import declarative_base, relationship
 import logging
+# Движки и фабрики сессий создаются в db; здесь они переэкспортируются для прежних импортов
+from db import engine, Session, WriteSession
+from migrations import migrate
+from change_feed import change_feed, OrderInserted, StockDelta, ActivityCreated
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -35,6 +43,10 @@ class Client(Base):
 
 class Order(Base):
     __tablename__ = 'orders'
+    __table_args__ = (
+        # Фильтры по периоду в прогнозе и подсчёт заказов за день в симуляторе
+        Index('ix_orders_date_client', 'order_date', 'client_id'),
+    )
     id = Column(Integer, primary_key=True)
     client_id = Column(Integer, ForeignKey('clients.id'))
     order_date = Column(Date)
@@ -43,6 +55,11 @@ class Order(Base):
 
 class OrderItem(Base):
     __tablename__ = 'order_items'
+    __table_args__ = (
+        # Покрывающий индекс для соединения с orders: активность клиентов и водяные знаки моделей
+        Index('ix_order_items_order_product', 'order_id', 'product_id', 'quantity', 'price'),
+        Index('ix_order_items_product', 'product_id'),
+    )
     id = Column(Integer, primary_key=True)
     order_id = Column(Integer, ForeignKey('orders.id'))
     product_id = Column(Integer, ForeignKey('products.id'))
@@ -52,6 +69,10 @@ class OrderItem(Base):
 
 class MarketingActivity(Base):
     __tablename__ = 'marketing_activities'
+    __table_args__ = (
+        # Поиск акций, пересекающихся с периодом прогноза
+        Index('ix_marketing_activities_dates', 'start_date', 'end_date'),
+    )
     id = Column(Integer, primary_key=True)
     name = Column(String)
     start_date = Column(Date)
@@ -61,6 +82,9 @@ class MarketingActivity(Base):
 
 class ActivityProduct(Base):
     __tablename__ = 'activity_products'
+    __table_args__ = (
+        Index('ix_activity_products_activity', 'activity_id', 'product_id'),
+    )
     id = Column(Integer, primary_key=True)
     activity_id = Column(Integer, ForeignKey('marketing_activities.id'))
     product_id = Column(Integer, ForeignKey('products.id'))
@@ -69,6 +93,10 @@ class ActivityProduct(Base):
 
 class SalesPlan(Base):
     __tablename__ = 'sales_plan'
+    __table_args__ = (
+        # Один план на продукт и дату; используется для upsert при сохранении прогноза
+        Index('uq_sales_plan_date_product', 'plan_date', 'product_id', unique=True),
+    )
     id = Column(Integer, primary_key=True)
     plan_date = Column(Date)
     product_id = Column(Integer, ForeignKey('products.id'), nullable=True)
@@ -76,10 +104,172 @@ class SalesPlan(Base):
     forecast_quantity = Column(Float)
     product = relationship("Product")
 
+class DailySales(Base):
+    """Дневная сводка продаж по продукту и клиенту.
+
+    Обновляется в одной транзакции с вставкой заказов. revenue считается так же,
+    как в отчётах: сумма quantity * price по строкам заказов.
+    """
+    __tablename__ = 'daily_sales'
+    sale_date = Column(Date, primary_key=True)
+    product_id = Column(Integer, ForeignKey('products.id'), primary_key=True)
+    client_id = Column(Integer, ForeignKey('clients.id'), primary_key=True)
+    quantity = Column(Integer)
+    revenue = Column(Float)
+    product = relationship("Product")
+    client = relationship("Client")
+
+class DataVersion(Base):
+    """Версия данных отчётов за дату.
+
+    Увеличивается в одной транзакции с записью заказов или планов за эту дату, в том
+    числе из других процессов (ночной прогноз). Кэш отчётов сравнивает версии дат периода
+    и пересчитывает только периоды, данные которых изменились.
+    """
+    __tablename__ = 'data_versions'
+    version_date = Column(Date, primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+
+
+def bump_data_versions(session, dates):
+    """Увеличивает версии данных за указанные даты."""
+    dates = sorted(set(dates))
+    if not dates:
+        return
+    table = DataVersion.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.version_date],
+        set_={"version": table.c.version + 1}
+    )
+    session.execute(stmt, [{"version_date": version_date, "version": 1} for version_date in dates])
+
+
+def add_to_daily_sales(session, order_date, client_id, items):
+    """Прибавляет строки заказа [(product_id, quantity, price), ...] к дневной сводке."""
+    totals = {}
+    for product_id, quantity, price in items:
+        q, r = totals.get(product_id, (0, 0.0))
+        totals[product_id] = (q + quantity, r + quantity * price)
+    table = DailySales.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.sale_date, table.c.product_id, table.c.client_id],
+        set_={
+            "quantity": table.c.quantity + stmt.excluded.quantity,
+            "revenue": table.c.revenue + stmt.excluded.revenue,
+        }
+    )
+    session.execute(stmt, [
+        {"sale_date": order_date, "product_id": product_id, "client_id": client_id, "quantity": q, "revenue": r}
+        for product_id, (q, r) in totals.items()
+    ])
+
+
+def apply_stock_changes(session, changes):
+    """Изменяет остатки продуктов {product_id: изменение} одним UPDATE, не ниже нуля.
+
+    Изменения передаются в запрос одним JSON-параметром, новые остатки возвращает
+    RETURNING. Прежний остаток читается только у продуктов, остаток которых упрётся в ноль:
+    у остальных фактическое изменение равно запрошенному. Возвращает события StockDelta
+    для продуктов, остаток которых изменился.
+    """
+    changes = {product_id: change for product_id, change in changes.items() if change}
+    if not changes:
+        return []
+    products = Product.__table__
+    requested = func.json_each(json.dumps({str(k): v for k, v in changes.items()})).table_valued(
+        "key", "value"
+    ).alias("requested")
+    stock = func.coalesce(products.c.stock_quantity, 0)
+    matches = products.c.id == cast(requested.c.key, Integer)
+    clamped = dict(session.execute(
+        select(products.c.id, stock).where(matches).where(stock + requested.c.value < 0)
+    ).all())
+    rows = session.execute(
+        update(products)
+        .where(matches)
+        .values(stock_quantity=func.max(0, stock + requested.c.value))
+        .returning(products.c.id, products.c.stock_quantity)
+    ).all()
+    events = []
+    for product_id, new_stock in sorted(rows):
+        delta = new_stock - clamped[product_id] if product_id in clamped else changes[product_id]
+        if delta:
+            events.append(StockDelta(product_id, delta, new_stock))
+    return events
+
+
+def insert_batches(session, table, rows, batch_size, started=None):
+    """Вставляет строки-словари в таблицу через executemany пачками по batch_size.
+
+    Каждая пачка фиксируется отдельной транзакцией. Если задано started (время начала по
+    time.perf_counter), в журнал пишется скорость вставки. Возвращает (число строк, секунды).
+    """
+    for i in range(0, len(rows), batch_size):
+        session.execute(table.insert(), rows[i:i + batch_size])
+        session.commit()
+    if started is None:
+        return len(rows), None
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Таблица {table.name} заполнена: {len(rows)} строк за {elapsed:.2f} с "
+        f"({len(rows) / elapsed if elapsed else 0:.0f} строк/с)"
+    )
+    return len(rows), elapsed
+
+
+def rebuild_daily_sales(session):
+    """Пересобирает дневную сводку из всей истории заказов одним INSERT ... SELECT."""
+    session.execute(delete(DailySales))
+    source = (
+        select(
+            Order.order_date,
+            OrderItem.product_id,
+            Order.client_id,
+            func.sum(OrderItem.quantity),
+            func.sum(OrderItem.quantity * OrderItem.price)
+        )
+        .join(OrderItem, Order.id == OrderItem.order_id)
+        .group_by(Order.order_date, OrderItem.product_id, Order.client_id)
+    )
+    session.execute(DailySales.__table__.insert().from_select(
+        ["sale_date", "product_id", "client_id", "quantity", "revenue"], source
+    ))
+
+
 # Инициализация базы данных
-engine = create_engine('sqlite:///pm_demo.db', echo=False)
-Base.metadata.create_all(engine)
-Session = sessionmaker(bind=engine)
+def clear_data(session):
+    """Удаляет продукты, клиентов, заказы, акции, сводку и планы перед заполнением заново."""
+    for model in (ActivityProduct, MarketingActivity, DailySales, OrderItem, Order, Client, Product, SalesPlan):
+        session.query(model).delete()
+    session.commit()
+
+
+def refresh_daily_sales(session, start_date, history_days):
+    """Пересчитывает daily_sales после загрузки истории и сбрасывает версии данных."""
+    started = time.perf_counter()
+    rebuild_daily_sales(session)
+    # Данные всех дат заменены: закэшированные отчёты устарели
+    session.query(DataVersion).update({DataVersion.version: DataVersion.version + 1})
+    bump_data_versions(session, (start_date + timedelta(days=i) for i in range(history_days)))
+    session.commit()
+    logger.info(f"Таблица daily_sales заполнена за {time.perf_counter() - started:.1f} с")
+
+
+def migrate_database():
+    """Доводит схему базы приложения до актуальной версии.
+
+    Вызывается точками входа (интерфейс, консольные утилиты), а не при импорте модуля:
+    модуль импортируют и дочерние процессы прогноза, и утилиты, работающие со своими базами.
+    """
+    migrate(engine, Base.metadata)
+
+
+# Установлено, пока симулятор записывает данные; фоновые читатели (предвыборка отчётов)
+# в это время не нагружают базу
+writer_busy = threading.Event()
+
 
 class DataSimulator:
     def __init__(self, interval_seconds=0.5):
@@ -88,6 +278,7 @@ class DataSimulator:
         self.thread = None
         self.iteration = 0
         self.categories = ["Крем", "Сыворотка", "Филлер"]
+        self.product_ids = []
 
     def start(self):
         """Запускает симулятор в отдельном потоке."""
@@ -107,7 +298,8 @@ class DataSimulator:
     def run(self):
         """Основной цикл симуляции."""
         while self.running:
-            session = Session()
+            session = WriteSession()
+            writer_busy.set()
             try:
                 self.generate_new_order(session)
                 self.adjust_inventory(session)
@@ -118,99 +310,116 @@ class DataSimulator:
                 logger.error(f"Ошибка симуляции: {e}")
                 session.rollback()
             finally:
-                session.close()
+                WriteSession.remove()
+                writer_busy.clear()
             time.sleep(self.interval)
 
-    def populate_initial_data(self, session):
-        """Заполняет начальные данные для всех таблиц."""
+    def populate_initial_data(self, session, n_products=100, n_clients=50, history_days=365, orders_per_day=10,
+                              batch_size=50000):
+        """Заполняет начальные данные для всех таблиц.
+
+        Ключи выделяются заранее (таблицы очищаются, id начинаются с 1), строки вставляются
+        через executemany SQLAlchemy Core пачками по batch_size. Возвращает
+        {таблица: (число строк, секунды)}.
+        """
         logger.info("Начало заполнения начальных данных")
-        session.query(ActivityProduct).delete()
-        session.query(MarketingActivity).delete()
-        session.query(OrderItem).delete()
-        session.query(Order).delete()
-        session.query(Client).delete()
-        session.query(Product).delete()
-        session.query(SalesPlan).delete()
-        session.commit()
+        clear_data(session)
+        stats = {}
 
         # Заполнение таблицы products
-        for i in range(100):
+        started = time.perf_counter()
+        products = []
+        for i in range(n_products):
             category = random.choice(self.categories)
-            product = Product(
-                name=f"Продукт {i+1}",
-                category=category,
-                price=round(random.uniform(1000, 10000), 2),
-                shelf_life=random.randint(30, 365),
-                temperature_sensitive=random.choice([True, False]),
-                brand=f"Бренд {random.randint(1, 10)}",
-                stock_quantity=random.randint(10, 100),
-                ph_level=round(random.uniform(4.5, 7.5), 1) if category in ["Крем", "Сыворотка"] else None
-            )
-            session.add(product)
-        session.commit()
-        logger.info("Таблица products заполнена")
+            products.append({
+                "id": i + 1,
+                "name": f"Продукт {i+1}",
+                "category": category,
+                "price": round(random.uniform(1000, 10000), 2),
+                "shelf_life": random.randint(30, 365),
+                "temperature_sensitive": random.choice([True, False]),
+                "brand": f"Бренд {random.randint(1, 10)}",
+                "stock_quantity": random.randint(10, 100),
+                "ph_level": round(random.uniform(4.5, 7.5), 1) if category in ["Крем", "Сыворотка"] else None
+            })
+        stats["products"] = insert_batches(session, Product.__table__, products, batch_size, started)
 
         # Заполнение таблицы clients
+        started = time.perf_counter()
         regions = ["Москва", "Санкт-Петербург", "Регионы"]
-        for i in range(50):
-            session.add(Client(
-                name=f"Клиент {i+1}",
-                client_type=random.choice(["косметолог", "клиника"]),
-                region=random.choice(regions)
-            ))
-        session.commit()
-        logger.info("Таблица clients заполнена")
-
-        # Заполнение таблиц orders и order_items (10 заказов на день)
-        clients = session.query(Client).all()
-        products = session.query(Product).all()
-        start_date = date.today() - timedelta(days=365)
-        end_date = date.today() - timedelta(days=1)
-        orders_per_day = 10
-
-        for day_offset in range((end_date - start_date).days + 1):
+        clients = [
+            {
+                "id": i + 1,
+                "name": f"Клиент {i+1}",
+                "client_type": random.choice(["косметолог", "клиника"]),
+                "region": random.choice(regions)
+            }
+            for i in range(n_clients)
+        ]
+        stats["clients"] = insert_batches(session, Client.__table__, clients, batch_size, started)
+
+        # Заполнение таблиц orders и order_items (orders_per_day заказов на день)
+        started = time.perf_counter()
+        prices = [product["price"] for product in products]
+        start_date = date.today() - timedelta(days=history_days)
+        order_rows, item_rows = [], []
+        order_id = item_id = 0
+        for day_offset in range(history_days):
             current_date = start_date + timedelta(days=day_offset)
             for _ in range(orders_per_day):
-                order = Order(
-                    client=random.choice(clients),
-                    order_date=current_date,
-                    status="Выполнен"
-                )
-                session.add(order)
-                session.flush()
-
+                order_id += 1
+                order_rows.append({
+                    "id": order_id,
+                    "client_id": random.randint(1, n_clients),
+                    "order_date": current_date,
+                    "status": "Выполнен"
+                })
                 for _ in range(random.randint(1, 5)):
-                    product = random.choice(products)
+                    item_id += 1
+                    product_index = random.randrange(n_products)
                     quantity = random.randint(1, 10)
-                    price = round(product.price * quantity, 2)
-                    session.add(OrderItem(
-                        order=order,
-                        product=product,
-                        quantity=quantity,
-                        price=price
-                    ))
-                session.commit()
-            logger.debug(f"Создано {orders_per_day} заказов для {current_date}")
-
-        logger.info(f"Таблицы orders и order_items заполнены: ~{orders_per_day * 365} заказов")
+                    item_rows.append({
+                        "id": item_id,
+                        "order_id": order_id,
+                        "product_id": product_index + 1,
+                        "quantity": quantity,
+                        "price": round(prices[product_index] * quantity, 2)
+                    })
+                if len(item_rows) >= batch_size:
+                    insert_batches(session, Order.__table__, order_rows, batch_size)
+                    insert_batches(session, OrderItem.__table__, item_rows, batch_size)
+                    order_rows, item_rows = [], []
+                    logger.debug(f"Вставлено {item_id} строк заказов")
+        insert_batches(session, Order.__table__, order_rows, batch_size)
+        insert_batches(session, OrderItem.__table__, item_rows, batch_size)
+        elapsed = time.perf_counter() - started
+        stats["orders"] = (order_id, elapsed)
+        stats["order_items"] = (item_id, elapsed)
+        logger.info(
+            f"Таблицы orders и order_items заполнены: {order_id} заказов, {item_id} строк за {elapsed:.1f} с "
+            f"({(order_id + item_id) / elapsed if elapsed else 0:.0f} строк/с)"
+        )
+
+        refresh_daily_sales(session, start_date, history_days)
 
         # Заполнение таблиц marketing_activities и activity_products
+        activities, activity_products = [], []
         for i in range(10):
             start_date = date.today() - timedelta(days=random.randint(10, 30))
             end_date = start_date + timedelta(days=random.randint(5, 15))
-            activity = MarketingActivity(
-                name=f"Акция {i+1000}",
-                start_date=start_date,
-                end_date=end_date,
-                description=f"Скидки на товары {i+1}"
-            )
-            session.add(activity)
-            session.commit()
-
-            for product in random.sample(products, min(5, len(products))):
-                session.add(ActivityProduct(activity=activity, product=product))
-            session.commit()
+            activities.append({
+                "id": i + 1,
+                "name": f"Акция {i+1000}",
+                "start_date": start_date,
+                "end_date": end_date,
+                "description": f"Скидки на товары {i+1}"
+            })
+            for product_index in random.sample(range(n_products), min(5, n_products)):
+                activity_products.append({"activity_id": i + 1, "product_id": product_index + 1})
+        insert_batches(session, MarketingActivity.__table__, activities, batch_size)
+        insert_batches(session, ActivityProduct.__table__, activity_products, batch_size)
         logger.info("Таблицы marketing_activities и activity_products заполнены")
+        return stats
 
     def generate_new_order(self, session):
         """Генерирует заказы для сегодняшней даты, чтобы их было столько же, как и раньше."""
@@ -230,14 +439,16 @@ class DataSimulator:
 
         # Создаем недостающие заказы
         for _ in range(desired_orders_per_day - existing_orders_count):
+            client = random.choice(clients)
             order = Order(
-                client=random.choice(clients),
+                client=client,
                 order_date=current_date,
                 status="Выполнен"
             )
             session.add(order)
             session.flush()
 
+            items = []
             for _ in range(random.randint(1, 5)):
                 product = random.choice(products)
                 quantity = random.randint(1, 10)
@@ -248,15 +459,24 @@ class DataSimulator:
                     quantity=quantity,
                     price=price
                 ))
+                items.append((product.id, quantity, price))
+            # Сводка обновляется в той же транзакции, что и заказ
+            add_to_daily_sales(session, current_date, client.id, items)
+            bump_data_versions(session, [current_date])
             session.commit()
+            change_feed.publish([OrderInserted(order.id, current_date, client.id, tuple(items))])
             logger.debug(f"Создан заказ №{order.id} от {current_date}")
 
     def adjust_inventory(self, session):
-        """Корректирует запасы продуктов."""
-        for product in session.query(Product).all():
-            change = random.randint(-3, 3)
-            product.stock_quantity = max(0, (product.stock_quantity or 0) + change)
+        """Корректирует запасы всех продуктов одним запросом: случайное изменение от -3 до 3."""
+        if not self.product_ids:
+            # Симулятор не добавляет продукты, поэтому список id читается один раз
+            self.product_ids = session.execute(select(Product.id)).scalars().all()
+        events = apply_stock_changes(
+            session, {product_id: random.randint(-3, 3) for product_id in self.product_ids}
+        )
         session.commit()
+        change_feed.publish(events)
         logger.debug("Запасы продуктов скорректированы")
 
     def generate_marketing_activity(self, session):
@@ -277,22 +497,42 @@ class DataSimulator:
         session.add(activity)
         session.commit()
 
-        for product in random.sample(products, min(5, len(products))):
+        sample = random.sample(products, min(5, len(products)))
+        for product in sample:
             session.add(ActivityProduct(activity=activity, product=product))
         session.commit()
+        change_feed.publish([ActivityCreated(
+            activity.id, name, start_date, end_date, tuple(product.id for product in sample)
+        )])
         logger.debug(f"Добавлена маркетинговая активность: {activity.name}")
 
 
 if __name__ == "__main__":
-    Base.metadata.create_all(engine)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Заполнение демонстрационной базы и запуск симулятора")
+    parser.add_argument("--products", type=int, default=100, help="число продуктов")
+    parser.add_argument("--clients", type=int, default=50, help="число клиентов")
+    parser.add_argument("--days", type=int, default=365, help="глубина истории заказов в днях")
+    parser.add_argument("--orders-per-day", type=int, default=10, help="число заказов в день")
+    parser.add_argument("--batch-size", type=int, default=50000, help="строк в одной вставке executemany")
+    parser.add_argument("--run-seconds", type=float, default=30,
+                        help="сколько секунд работать симулятору после заполнения (0 — не запускать)")
+    args = parser.parse_args()
+
+    migrate_database()
     simulator = DataSimulator(interval_seconds=2)
     session = Session()
-    simulator.populate_initial_data(session)
+    simulator.populate_initial_data(
+        session, n_products=args.products, n_clients=args.clients, history_days=args.days,
+        orders_per_day=args.orders_per_day, batch_size=args.batch_size
+    )
     session.close()
-    simulator.start()
-    try:
-        time.sleep(30)
-    except KeyboardInterrupt:
-        pass
-    finally:
-        simulator.stop()
\ No newline at end of file
+    if args.run_seconds > 0:
+        simulator.start()
+        try:
+            time.sleep(args.run_seconds)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            simulator.stop()
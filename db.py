@@ -0,0 +1,56 @@
+"""Подключение к базе SQLite для одновременной работы интерфейса и симулятора.
+
+Каждое соединение при открытии настраивается прагмами: журнал WAL (чтение не блокирует
+запись и наоборот), busy_timeout (ожидание блокировки вместо немедленной ошибки
+«database is locked»), synchronous=NORMAL, размер кэша страниц и mmap.
+
+Читатели и писатель разделены:
+- Session — короткие сессии чтения (фоновые потоки отчётов, прогноза, выгрузки);
+- ReadSession — сессия потока интерфейса (scoped_session, своя в каждом потоке);
+- WriteSession — сессия потока записи (симулятор, генератор нагрузки). Её транзакции
+  начинаются с BEGIN IMMEDIATE: блокировка записи берётся сразу и ожидается по
+  busy_timeout, а не при первом изменении, когда SQLite может вернуть ошибку без ожидания.
+"""
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker, scoped_session
+
+from settings import DATABASE_URL, DB_BUSY_TIMEOUT_MS, DB_CACHE_MB, DB_MMAP_MB
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    # В режиме WAL NORMAL не теряет целостность, fsync выполняется только при checkpoint
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA cache_size={-DB_CACHE_MB * 1024}")
+    cursor.execute(f"PRAGMA mmap_size={DB_MMAP_MB * 2**20}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def create_db_engine(url=DATABASE_URL, immediate=False):
+    """Создаёт движок SQLAlchemy с настройкой соединений для одновременного доступа.
+
+    immediate=True — движок писателя: транзакции открываются командой BEGIN IMMEDIATE.
+    """
+    engine = create_engine(url, echo=False)
+    event.listen(engine, "connect", set_sqlite_pragmas)
+    if immediate:
+        @event.listens_for(engine, "connect")
+        def disable_implicit_begin(dbapi_connection, connection_record):
+            # Драйвер не открывает транзакции сам, их начало задаёт обработчик begin
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine, "begin")
+        def begin_immediate(connection):
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+    return engine
+
+
+engine = create_db_engine()
+write_engine = create_db_engine(immediate=True)
+
+Session = sessionmaker(bind=engine)
+ReadSession = scoped_session(Session)
+WriteSession = scoped_session(sessionmaker(bind=write_engine))
@@ -0,0 +1,170 @@
+"""Бенчмарк одновременного чтения и записи базы.
+
+Писатель в отдельном потоке пишет заказы с заданной скоростью (как LoadGenerator), а
+несколько потоков-читателей в это время выполняют запросы отчёта аналитики. Сравниваются
+режимы подключения:
+- default — create_engine без настроек, журнал отката (DELETE), ожидание блокировки 5 с
+  драйвера sqlite3, транзакции писателя открываются при первом изменении;
+- tuned — движки из db.create_db_engine: WAL, busy_timeout, BEGIN IMMEDIATE у писателя.
+Каждый режим работает на своей копии базы. Результаты выводятся в формате JSON Lines.
+
+Пример запуска:
+    python db_bench.py --db pm_demo.db --readers 4 --rate 200 --seconds 20
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import closing
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from analytics_service import daily_totals_query, product_totals_query, get_data_version
+from data_simulator import Base
+from db import create_db_engine
+from load_generator import LoadGenerator, LoadMetrics, TICK_SECONDS, is_lock_error
+from migrations import migrate
+
+logger = logging.getLogger("db_bench")
+
+MODES = ("default", "tuned")
+
+
+def create_engines(path, mode):
+    """(движок читателей, движок писателя) для режима подключения."""
+    url = f"sqlite:///{path}"
+    if mode == "tuned":
+        return create_db_engine(url), create_db_engine(url, immediate=True)
+    engine = create_engine(url, echo=False)
+    with engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA journal_mode=DELETE")
+    return engine, engine
+
+
+def read_report(session, today):
+    """Запросы, которые выполняет отчёт аналитики при открытии периода."""
+    date_from = today - timedelta(days=30)
+    get_data_version(session, date_from, today)
+    daily_totals_query(session, date_from, today).all()
+    product_totals_query(session, today).limit(200).all()
+
+
+def reader_loop(session_factory, stop, latencies, errors):
+    today = date.today()
+    while not stop.is_set():
+        session = session_factory()
+        started = time.perf_counter()
+        try:
+            read_report(session, today)
+        except OperationalError as e:
+            errors["lock" if is_lock_error(e) else "other"] += 1
+        else:
+            latencies.append(time.perf_counter() - started)
+        finally:
+            session.close()
+
+
+def writer_loop(session_factory, generator, stop):
+    session = session_factory()
+    try:
+        generator.load_reference(session)
+        session.commit()
+        per_tick = generator.rate * TICK_SECONDS
+        credit = 0.0
+        while not stop.is_set():
+            tick = time.perf_counter()
+            credit += per_tick
+            if credit >= 1:
+                due = int(credit)
+                credit -= due
+                generator.write(session, generator.write_orders, due)
+            time.sleep(max(0.0, TICK_SECONDS - (time.perf_counter() - tick)))
+    finally:
+        session.close()
+
+
+def percentiles(values):
+    if not len(values):
+        return [None, None, None]
+    return [round(float(v), 1) for v in np.percentile(values, [50, 95, 99])]
+
+
+def run_mode(db_path, mode, readers, rate, seconds):
+    """Один прогон режима на копии базы; возвращает метрики читателей и писателя."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        # Изменения из журнала WAL переносятся в файл базы перед копированием
+        with closing(sqlite3.connect(db_path)) as connection:
+            connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        shutil.copyfile(db_path, path)
+        read_engine, write_engine = create_engines(path, mode)
+        migrate(write_engine, Base.metadata)
+        read_factory = sessionmaker(bind=read_engine)
+        write_factory = sessionmaker(bind=write_engine)
+        generator = LoadGenerator(rate)
+        generator.metrics = LoadMetrics(window=seconds * 2)
+        stop = threading.Event()
+        latencies = [[] for _ in range(readers)]
+        errors = {"lock": 0, "other": 0}
+        threads = [threading.Thread(target=writer_loop, args=(write_factory, generator, stop))]
+        threads += [
+            threading.Thread(target=reader_loop, args=(read_factory, stop, latencies[i], errors))
+            for i in range(readers)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        read_engine.dispose()
+        write_engine.dispose()
+
+    read_ms = np.concatenate([np.asarray(values) for values in latencies]) * 1000
+    writer = generator.metrics
+    write_ms = np.array([c[2] for c in writer.commits]) * 1000
+    return {
+        "mode": mode,
+        "readers": readers,
+        "target_rate": rate,
+        "seconds": seconds,
+        "reads_per_s": round(len(read_ms) / seconds, 1),
+        "read_ms_p50_p95_p99": percentiles(read_ms),
+        "read_lock_errors": errors["lock"],
+        "read_other_errors": errors["other"],
+        "orders_per_s": round(writer.total_orders / seconds, 1),
+        "write_ms_p50_p95_p99": percentiles(write_ms),
+        "write_lock_errors": writer.lock_errors,
+        "write_other_errors": writer.errors,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк одновременного чтения и записи базы")
+    parser.add_argument("--db", default="pm_demo.db", help="исходная база (копируется для каждого режима)")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--readers", type=int, default=4, help="число потоков-читателей")
+    parser.add_argument("--rate", type=float, default=200, help="скорость писателя, заказов в секунду")
+    parser.add_argument("--seconds", type=float, default=20, help="длительность прогона режима")
+    args = parser.parse_args(argv)
+
+    for mode in args.modes:
+        logger.info(f"Режим {mode}: {args.readers} читателей, писатель {args.rate} заказов/с, {args.seconds} с")
+        result = run_mode(args.db, mode, args.readers, args.rate, args.seconds)
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(main())
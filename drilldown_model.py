@@ -0,0 +1,200 @@
+import logging
+import time
+from bisect import bisect_left
+
+from PyQt6.QtCore import QAbstractItemModel, QModelIndex, Qt
+from sqlalchemy.exc import OperationalError
+
+from analytics_service import daily_totals_query, product_totals_query, client_sales_query
+from table_models import format_date, format_money
+
+logger = logging.getLogger(__name__)
+
+# Уровни дерева детализации
+LEVEL_DAY, LEVEL_PRODUCT, LEVEL_CLIENT = range(3)
+
+# Число строк, загружаемых одним запросом при раскрытии узла или прокрутке
+PAGE_SIZE = 200
+
+
+class DrillNode:
+    __slots__ = ("parent", "row", "level", "key", "label", "quantity", "revenue", "children", "exhausted", "loaded_at")
+
+    def __init__(self, parent=None, row=0, level=LEVEL_DAY - 1, key=None, label=None, quantity=0, revenue=0.0,
+                 loaded_at=0.0):
+        self.parent = parent
+        self.row = row
+        self.level = level
+        self.key = key
+        self.label = label
+        self.quantity = quantity
+        self.revenue = revenue
+        self.children = []
+        self.exhausted = level == LEVEL_CLIENT
+        self.loaded_at = loaded_at   # time.monotonic() перед чтением строки из базы
+
+
+class DrillDownModel(QAbstractItemModel):
+    """Дерево детализации продаж: день → продукт → клиент.
+
+    Узлы загружаются лениво: дочерние строки запрашиваются агрегирующим запросом к
+    daily_sales только при раскрытии узла, страницами по PAGE_SIZE по мере прокрутки.
+    Страницы выбираются по ключу (после последнего загруженного), поэтому курсор не
+    держится открытым между страницами и не блокирует запись в базу.
+    """
+
+    headers = ["Дата / продукт / клиент", "Количество", "Сумма"]
+
+    def __init__(self, session, parent=None):
+        super().__init__(parent)
+        self.session = session
+        self.date_from = None
+        self.date_to = None
+        self.root = DrillNode()
+        self.root.exhausted = True
+
+    def set_period(self, date_from, date_to):
+        """Сбрасывает дерево на новый период; дни загружаются при первом отображении."""
+        self.beginResetModel()
+        self.date_from = date_from
+        self.date_to = date_to
+        self.root = DrillNode()
+        self.endResetModel()
+
+    def node(self, index):
+        return index.internalPointer() if index.isValid() else self.root
+
+    def page_query(self, node):
+        after = node.children[-1].key if node.children else None
+        if node.level == LEVEL_DAY - 1:
+            return daily_totals_query(self.session, self.date_from, self.date_to, after)
+        if node.level == LEVEL_DAY:
+            return product_totals_query(self.session, node.key, after)
+        return client_sales_query(self.session, node.parent.key, node.key, after)
+
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        return self.createIndex(row, column, self.node(parent).children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is self.root:
+            return QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self.node(parent).children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.headers)
+
+    def hasChildren(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return False
+        node = self.node(parent)
+        return node.level < LEVEL_CLIENT and (bool(node.children) or not node.exhausted)
+
+    def canFetchMore(self, parent):
+        if parent.column() > 0 or self.date_from is None:
+            return False
+        return not self.node(parent).exhausted
+
+    def fetchMore(self, parent):
+        node = self.node(parent)
+        loaded_at = time.monotonic()
+        try:
+            rows = self.page_query(node).limit(PAGE_SIZE).all()
+        except OperationalError as e:
+            # Страница будет запрошена снова при следующей прокрутке
+            logger.error(f"Ошибка загрузки детализации: {str(e)}")
+            self.session.rollback()
+            return
+        if len(rows) < PAGE_SIZE:
+            node.exhausted = True
+        if not rows:
+            return
+        start = len(node.children)
+        self.beginInsertRows(parent, start, start + len(rows) - 1)
+        node.children.extend(
+            DrillNode(node, start + i, node.level + 1, r.key, r.label, r.quantity or 0, r.revenue or 0.0, loaded_at)
+            for i, r in enumerate(rows)
+        )
+        self.endInsertRows()
+        logger.debug(f"Детализация: загружено {len(rows)} строк уровня {node.level + 1}")
+
+    def apply_orders(self, orders):
+        """Прибавляет новые заказы [(published_at, OrderInserted), ...] к загруженным узлам дерева.
+
+        Незагруженные уровни и строки, прочитанные уже после записи заказа, не затрагиваются:
+        они содержат актуальные суммы.
+        Новый день добавляется в список дней; если среди загруженных строк продукта или
+        клиента нет, а по порядку ключей он должен там быть, строки этого узла перечитываются.
+        """
+        if self.date_from is None:
+            return
+        for published_at, order in orders:
+            if not self.date_from <= order.order_date <= self.date_to:
+                continue
+            for product_id, quantity, price in order.items:
+                self.add_sale(
+                    (order.order_date, product_id, order.client_id), quantity, quantity * price, published_at
+                )
+
+    def add_sale(self, keys, quantity, revenue, published_at):
+        node, parent = self.root, QModelIndex()
+        for key in keys:
+            position = bisect_left(node.children, key, key=lambda child: child.key)
+            found = position < len(node.children) and node.children[position].key == key
+            if not found:
+                # Строки после последнего загруженного ключа придут со следующей страницей
+                if node.exhausted or position < len(node.children):
+                    if node is self.root:
+                        self.insert_child(node, parent, position, DrillNode(
+                            node, position, LEVEL_DAY, key, key, quantity, revenue, published_at
+                        ))
+                    else:
+                        self.reload_children(node, parent)
+                return
+            child = node.children[position]
+            if child.loaded_at > published_at:
+                return
+            child.quantity += quantity
+            child.revenue += revenue
+            self.dataChanged.emit(self.createIndex(child.row, 1, child), self.createIndex(child.row, 2, child))
+            node, parent = child, self.createIndex(child.row, 0, child)
+
+    def insert_child(self, node, parent, position, child):
+        self.beginInsertRows(parent, position, position)
+        node.children.insert(position, child)
+        for row in range(position + 1, len(node.children)):
+            node.children[row].row = row
+        self.endInsertRows()
+
+    def reload_children(self, node, parent):
+        """Сбрасывает загруженные дочерние строки узла; они запросятся заново при отображении."""
+        if node.children:
+            self.beginRemoveRows(parent, 0, len(node.children) - 1)
+            node.children = []
+            self.endRemoveRows()
+        node.exhausted = False
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        node = index.internalPointer()
+        column = index.column()
+        if column == 0:
+            return format_date(node.label) if node.level == LEVEL_DAY else str(node.label)
+        if column == 1:
+            return str(node.quantity)
+        return format_money(node.revenue)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.headers[section]
+        return None
@@ -0,0 +1,208 @@
+"""Бенчмарк и бэктест конвейера прогноза.
+
+Для каждого масштаба (продукты × дни истории) history_generator создаёт детерминированную
+историю в отдельный файл SQLite. Затем для каждой модели и числа процессов выполняется
+бэктест со скользящей точкой прогноза: прогноз на horizon дней сравнивается с фактом.
+Результаты выводятся в формате JSON Lines, по одной записи на конфигурацию.
+
+Пример запуска:
+    python forecast_bench.py --scales 20x120 100x365 --engines prophet holt_winters --workers 1 4
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from data_simulator import Base
+from forecast_service import ForecastService, FORECAST_ENGINES, load_sales_matrix
+from history_generator import generate_history
+from migrations import migrate
+
+# Конец истории по умолчанию: наборы данных бенчмарка не зависят от даты запуска
+BENCH_END_DATE = date(2025, 1, 1)
+
+logger = logging.getLogger("forecast_bench")
+
+
+def parse_scale(value):
+    products, days = value.lower().split("x")
+    return int(products), int(days)
+
+
+def prepare_history(data_dir, n_products, history_days, seed, end_date):
+    """Создаёт (или переиспользует) базу с детерминированной историей заданного масштаба до end_date."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"history_{n_products}x{history_days}_seed{seed}_end{end_date:%Y%m%d}.db")
+    engine = create_engine(f"sqlite:///{path}", echo=False)
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        logger.info(f"Генерация истории {n_products}×{history_days} в {path}")
+        migrate(engine, Base.metadata)
+        session = sessionmaker(bind=engine)()
+        try:
+            generate_history(
+                session, n_products=n_products, n_clients=max(n_products // 2, 1), history_days=history_days,
+                seed=seed, end_date=end_date
+            )
+        finally:
+            session.close()
+    return engine
+
+
+def run_folds(session, engine_name, workers, hierarchy, history_days, folds, horizon, end_date):
+    """Прогноз во всех точках бэктеста; возвращает метрики времени и точности."""
+    fit_time = 0.0
+    n_series = 0
+    abs_errors = 0.0
+    actual_total = 0.0
+    ape = []
+
+    started = time.perf_counter()
+    for fold in range(folds):
+        origin = end_date - timedelta(days=(folds - fold) * horizon)
+        service = ForecastService(
+            workers, horizon, model_store=None, engine=engine_name, hierarchy_level=hierarchy,
+            history_days=history_days
+        )
+        fit_marks = {}
+
+        def on_prepared(context):
+            fit_marks["start"] = time.perf_counter()
+
+        def on_progress(done, total):
+            fit_marks["end"] = time.perf_counter()
+            fit_marks["total"] = total
+
+        rows = service.run(session, start_date=origin, on_prepared=on_prepared, on_progress=on_progress)
+        fit_time += fit_marks["end"] - fit_marks["start"]
+        n_series += fit_marks["total"]
+
+        # Факт за горизонт прогноза в той же раскладке дни × продукты
+        product_ids = sorted({row['product_id'] for row in rows})
+        _, actual = load_sales_matrix(session, origin, origin + timedelta(days=horizon - 1), product_ids)
+        if actual is None:
+            actual = np.zeros((horizon, len(product_ids)))
+        predicted = np.zeros_like(actual)
+        columns = {pid: j for j, pid in enumerate(product_ids)}
+        for row in rows:
+            predicted[(row['date'] - origin).days, columns[row['product_id']]] = row['forecast']
+
+        errors = np.abs(actual - predicted)
+        abs_errors += errors.sum()
+        actual_total += actual.sum()
+        nonzero = actual > 0
+        ape.extend((errors[nonzero] / actual[nonzero]).tolist())
+    wall_time = time.perf_counter() - started
+
+    return {
+        "series": n_series // folds,
+        "fit_time_per_series_s": fit_time / n_series if n_series else None,
+        "wall_time_s": wall_time,
+        "mape": float(np.mean(ape)) if ape else None,
+        "wape": abs_errors / actual_total if actual_total else None,
+    }
+
+
+def backtest(session, engine_name, workers, hierarchy, history_days, folds, horizon, end_date, trace_memory=True):
+    """Бэктест со скользящей точкой прогноза; возвращает метрики времени, памяти и точности.
+
+    Точки прогноза отсчитываются от end_date — дня после конца сгенерированной истории.
+    Время измеряется в проходе без tracemalloc: трассировка замедляет код на Python и
+    исказила бы сравнение моделей. Пиковая память Python (peak_traced_mb) измеряется
+    отдельным повторным проходом, если trace_memory.
+    """
+    args = (session, engine_name, workers, hierarchy, history_days, folds, horizon, end_date)
+    result = run_folds(*args)
+
+    peak_traced = None
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            run_folds(*args)
+            _, peak_traced = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    result.update({
+        "peak_traced_mb": peak_traced / 2 ** 20 if peak_traced is not None else None,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "max_rss_children_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    })
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк и бэктест конвейера прогноза")
+    parser.add_argument("--scales", nargs="+", type=parse_scale, default=[(20, 120), (100, 365)],
+                        help="масштабы истории в виде ПРОДУКТЫxДНИ")
+    parser.add_argument("--engines", nargs="+", choices=list(FORECAST_ENGINES), default=list(FORECAST_ENGINES))
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, os.cpu_count() or 1])
+    parser.add_argument("--hierarchy", default="", help="уровень иерархического прогноза")
+    parser.add_argument("--folds", type=int, default=3, help="число точек прогноза в бэктесте")
+    parser.add_argument("--horizon", type=int, default=14, help="горизонт прогноза в днях")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--end-date", type=date.fromisoformat, default=BENCH_END_DATE,
+                        help="день после конца сгенерированной истории, ГГГГ-ММ-ДД")
+    parser.add_argument("--no-trace-memory", dest="trace_memory", action="store_false",
+                        help="не измерять пиковую память отдельным проходом под tracemalloc")
+    parser.add_argument("--data-dir", default="bench_data", help="каталог для баз с историей")
+    parser.add_argument("--output", default=None, help="файл JSON Lines (по умолчанию stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for n_products, history_days in args.scales:
+            engine = prepare_history(args.data_dir, n_products, history_days, args.seed, args.end_date)
+            session = sessionmaker(bind=engine)()
+            train_days = history_days - args.folds * args.horizon
+            try:
+                for engine_name in args.engines:
+                    # Пакетная модель не использует пул процессов
+                    worker_counts = sorted(set(args.workers)) if engine_name != "holt_winters" else [1]
+                    for workers in worker_counts:
+                        logger.info(f"Бэктест {n_products}×{history_days}: {engine_name}, процессов {workers}")
+                        record = {
+                            "scale": f"{n_products}x{history_days}",
+                            "products": n_products,
+                            "days": history_days,
+                            "engine": engine_name,
+                            "hierarchy": args.hierarchy,
+                            "workers": workers,
+                            "folds": args.folds,
+                            "horizon": args.horizon,
+                            "seed": args.seed,
+                            "end_date": args.end_date.isoformat(),
+                        }
+                        record.update(backtest(
+                            session, engine_name, workers, args.hierarchy, train_days, args.folds, args.horizon,
+                            args.end_date, args.trace_memory
+                        ))
+                        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        output.flush()
+            finally:
+                session.close()
+                engine.dispose()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    logging.getLogger("forecast_service").setLevel(logging.WARNING)
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import logging
+import os
+
+from settings import MODEL_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Меняется при изменении параметров модели, чтобы старый кэш не использовался
+MODEL_VERSION = 1
+
+
+class ForecastModelStore:
+    """Дисковый кэш обученных моделей прогноза.
+
+    Для каждого ряда (продукта или группы продуктов при иерархическом прогнозе) хранится
+    сериализованная модель и водяной знак обучающих данных (глубина окна обучения в днях,
+    максимальный Order.id и order_date среди продаж ряда). Пока водяной знак не изменился,
+    модель можно использовать повторно без переобучения; модели, обученные на окне другой
+    длины, повторно не используются.
+    """
+
+    def __init__(self, cache_dir=MODEL_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.reset_stats()
+
+    def path_for(self, series_key):
+        if isinstance(series_key, int):
+            return os.path.join(self.cache_dir, f"product_{series_key}.json")
+        # Ключи групп («category:Крем») могут содержать недопустимые в именах файлов символы
+        digest = hashlib.sha1(str(series_key).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"group_{digest}.json")
+
+    @staticmethod
+    def make_watermark(history_days, max_order_id, max_order_date):
+        return [MODEL_VERSION, history_days, max_order_id, max_order_date.isoformat() if max_order_date else None]
+
+    def lookup(self, series_key, watermark):
+        """Возвращает сериализованную модель, если она обучена на тех же данных, иначе None."""
+        path = self.path_for(series_key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            logger.info(f"Кэш моделей: промах для ряда {series_key}")
+            return None
+        except (OSError, ValueError) as e:
+            self.misses += 1
+            logger.warning(f"Кэш моделей: не удалось прочитать {path}: {e}")
+            return None
+
+        if entry.get("watermark") != watermark:
+            self.refits += 1
+            logger.info(
+                f"Кэш моделей: изменились данные обучения ряда {series_key} "
+                f"({entry.get('watermark')} -> {watermark}), переобучение"
+            )
+            return None
+
+        self.hits += 1
+        logger.info(f"Кэш моделей: попадание для ряда {series_key}")
+        return entry["model"]
+
+    def save(self, series_key, watermark, model_json):
+        """Атомарно записывает модель ряда вместе с водяным знаком."""
+        path = self.path_for(series_key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"watermark": watermark, "model": model_json}, f)
+        os.replace(tmp_path, path)
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.refits = 0
+
+    def log_stats(self):
+        logger.info(f"Кэш моделей: попаданий {self.hits}, промахов {self.misses}, переобучений {self.refits}")
@@ -0,0 +1,69 @@
+"""Ночное задание: строит прогноз спроса и план продаж без GUI и сохраняет их в sales_plan.
+
+Пример запуска:
+    python -m forecast_job --days 30 --workers 8 --engine prophet
+"""
+import argparse
+import logging
+import multiprocessing
+import sys
+import time
+from datetime import datetime
+
+from data_simulator import Session, migrate_database
+from forecast_cache import ForecastModelStore
+from forecast_service import ForecastService, ForecastDataError, FORECAST_ENGINES, HIERARCHY_LEVELS, save_sales_plan
+from settings import FORECAST_WORKERS, FORECAST_ENGINE, FORECAST_HIERARCHY, MODEL_CACHE_DIR
+
+logger = logging.getLogger("forecast_job")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Построение прогноза и плана продаж без интерфейса")
+    parser.add_argument("--days", type=int, default=30, help="горизонт прогноза в днях")
+    parser.add_argument("--workers", type=int, default=FORECAST_WORKERS, help="число процессов для обучения моделей")
+    parser.add_argument("--engine", choices=list(FORECAST_ENGINES), default=FORECAST_ENGINE, help="модель прогноза")
+    parser.add_argument("--hierarchy", choices=list(HIERARCHY_LEVELS), default=FORECAST_HIERARCHY,
+                        help="уровень иерархического прогноза (пусто — по продуктам)")
+    parser.add_argument("--start", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date(), default=None,
+                        help="первая дата прогноза в формате ГГГГ-ММ-ДД (по умолчанию сегодня)")
+    parser.add_argument("--cache-dir", default=MODEL_CACHE_DIR, help="каталог кэша обученных моделей")
+    parser.add_argument("--no-cache", action="store_true", help="не использовать кэш моделей")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    migrate_database()
+    started = time.perf_counter()
+    model_store = None if args.no_cache else ForecastModelStore(args.cache_dir)
+    service = ForecastService(
+        args.workers, args.days, model_store=model_store, engine=args.engine, hierarchy_level=args.hierarchy
+    )
+
+    session = Session()
+    try:
+        rows = service.run(session, start_date=args.start)
+        saved_count, updated_count = save_sales_plan(session, rows)
+        session.commit()
+    except ForecastDataError as e:
+        logger.error(f"Прогноз не построен: {e}")
+        return 1
+    except Exception:
+        logger.exception("Ошибка ночного прогноза")
+        session.rollback()
+        return 1
+    finally:
+        session.close()
+
+    logger.info(
+        f"Прогноз сохранён: {saved_count} новых и {updated_count} обновлённых записей sales_plan "
+        f"за {time.perf_counter() - started:.1f} с"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(main())
@@ -0,0 +1,652 @@
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import date, timedelta, datetime
+import multiprocessing
+import threading
+import time
+import numpy as np
+import pandas as pd
+import logging
+from prophet import Prophet
+from prophet.serialize import model_to_json, model_from_json
+from data_simulator import (
+    Product, Order, OrderItem, SalesPlan, MarketingActivity, ActivityProduct, DailySales, bump_data_versions
+)
+from settings import FORECAST_WORKERS, FORECAST_ENGINE, FORECAST_HIERARCHY
+
+logger = logging.getLogger(__name__)
+
+# Как часто пул процессов прогноза проверяет отмену, секунд
+CANCEL_POLL_SECONDS = 0.2
+
+
+def fit_product_forecast(product_id, df, forecast_dates, model_json=None):
+    """Обучает модель Prophet для одного продукта и возвращает прогноз на даты forecast_dates.
+
+    Если передана сериализованная модель model_json, обучение пропускается и выполняется
+    только predict. Возвращает (product_id, прогноз, model_json новой модели или None).
+    Функция объявлена на уровне модуля, чтобы её можно было выполнять в дочернем процессе.
+    """
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+    fitted_json = None
+    if model_json is not None:
+        model = model_from_json(model_json)
+    else:
+        model = Prophet(
+            yearly_seasonality=True,
+            weekly_seasonality=True,
+            daily_seasonality=False,
+            seasonality_mode="multiplicative"
+        )
+        model.fit(df)
+        fitted_json = model_to_json(model)
+    # Используется только yhat, интервалы неопределённости не нужны
+    model.uncertainty_samples = 0
+    future = pd.DataFrame({"ds": pd.to_datetime(forecast_dates)})
+    forecast = model.predict(future)
+    return product_id, forecast[["ds", "yhat"]], fitted_json
+
+
+def fit_product_forecast_task(task):
+    """fit_product_forecast для пула процессов: аргументы передаются одним кортежем."""
+    return fit_product_forecast(*task)
+
+
+def iter_forecasts(inputs, forecast_dates, max_workers=FORECAST_WORKERS, cancel_event=None, cached_models=None):
+    """Обучает модели для всех продуктов и отдаёт (product_id, прогноз, model_json) по мере готовности.
+
+    inputs — словарь {product_id: DataFrame(ds, y)}, cached_models — {product_id: model_json}
+    для продуктов, модели которых не нужно переобучать. При max_workers > 1 модели
+    обучаются в пуле процессов. Если установлен cancel_event или генератор закрыт раньше
+    времени, процессы пула завершаются вместе с идущими обучениями.
+    """
+    cached_models = cached_models or {}
+    workers = min(max_workers or 1, len(inputs))
+    if workers <= 1:
+        for product_id, df in inputs.items():
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            yield fit_product_forecast(product_id, df, forecast_dates, cached_models.get(product_id))
+        return
+
+    logger.debug(f"Обучение {len(inputs)} моделей в {workers} процессах")
+    # spawn вместо fork: в GUI родительский процесс держит потоки Qt
+    context = multiprocessing.get_context("spawn")
+    pool = context.Pool(workers)
+    completed = False
+    try:
+        tasks = [
+            (product_id, df, forecast_dates, cached_models.get(product_id)) for product_id, df in inputs.items()
+        ]
+        results = pool.imap_unordered(fit_product_forecast_task, tasks)
+        remaining = len(tasks)
+        while remaining:
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            try:
+                # Ожидание с таймаутом, чтобы отмена не ждала окончания идущего обучения
+                result = results.next(timeout=CANCEL_POLL_SECONDS)
+            except multiprocessing.TimeoutError:
+                continue
+            remaining -= 1
+            yield result
+        completed = True
+    finally:
+        if completed:
+            pool.close()
+        else:
+            # Отмена, ошибка или закрытие генератора: процессы не должны пережить вызывающий код
+            pool.terminate()
+        pool.join()
+
+
+ENGINE_PROPHET = "prophet"
+ENGINE_HOLT_WINTERS = "holt_winters"
+FORECAST_ENGINES = {
+    ENGINE_PROPHET: "Prophet (точный)",
+    ENGINE_HOLT_WINTERS: "Хольт-Винтерс (быстрый)",
+}
+
+
+def holt_winters_forecast(history, forecast_days, alpha=0.3, beta=0.05, gamma=0.1, phi=0.98, season=7):
+    """Пакетный прогноз Хольта-Винтерса сразу для всех рядов.
+
+    history — матрица (дни × продукты). Уровень, затухающий тренд и недельная сезонность
+    сглаживаются одновременно для всех столбцов; годовая сезонность учитывается
+    отношением продаж год назад в окрестности целевой даты к продажам год назад
+    в окрестности последней даты истории. Возвращает матрицу (forecast_days × продукты).
+    """
+    history = np.asarray(history, dtype=float)
+    n_days, n_series = history.shape
+    if n_days < 2 * season:
+        return np.repeat(history.mean(axis=0, keepdims=True), forecast_days, axis=0)
+
+    level = history[:season].mean(axis=0)
+    trend = np.zeros(n_series)
+    seasonal = history[:season] - level
+    for t in range(season, n_days):
+        s_idx = t % season
+        y = history[t]
+        prev_level = level
+        level = alpha * (y - seasonal[s_idx]) + (1 - alpha) * (prev_level + phi * trend)
+        trend = beta * (level - prev_level) + (1 - beta) * phi * trend
+        seasonal[s_idx] = gamma * (y - level) + (1 - gamma) * seasonal[s_idx]
+
+    steps = np.arange(1, forecast_days + 1)
+    damped = np.cumsum(phi ** steps)
+    season_idx = (n_days + steps - 1) % season
+    yhat = level[None, :] + damped[:, None] * trend[None, :] + seasonal[season_idx]
+
+    # Годовая сезонность: как менялись продажи год назад от «сегодня» к целевой дате
+    year, window = 364, 14
+    if n_days > year:
+        def window_mean(center):
+            lo, hi = max(center - window, 0), min(center + window + 1, n_days)
+            return history[lo:hi].mean(axis=0)
+
+        base = window_mean(n_days - 1 - year)
+        targets = np.array([window_mean(n_days - 1 + h - year) for h in steps])
+        yearly = np.divide(targets, base[None, :], out=np.ones_like(targets), where=base[None, :] > 0)
+        yhat = yhat * np.clip(yearly, 0.5, 2.0)
+    return yhat
+
+
+def build_sales_matrix(order_dates, product_ids, revenues, date_from, n_days, columns):
+    """Раскладывает строки продаж (дата, продукт, выручка) в плотную матрицу дни × продукты.
+
+    columns — порядок продуктов в матрице. Матрица хранится по столбцам (order="F"),
+    чтобы ряд каждого продукта был непрерывным и его можно было отдавать без копирования.
+    """
+    column_index = {pid: j for j, pid in enumerate(columns)}
+    day_idx = np.fromiter(((d - date_from).days for d in order_dates), dtype=np.int64, count=len(order_dates))
+    col_idx = np.fromiter((column_index.get(pid, -1) for pid in product_ids), dtype=np.int64, count=len(product_ids))
+    values = np.asarray(revenues, dtype=float)
+    known = col_idx >= 0
+    matrix = np.zeros((n_days, len(columns)), dtype=float, order="F")
+    np.add.at(matrix, (day_idx[known], col_idx[known]), values[known])
+    return matrix
+
+
+def sales_matrix_query(session, date_from, date_to):
+    """Выручка по дате и продукту из дневной сводки daily_sales."""
+    return (
+        session.query(
+            DailySales.sale_date,
+            DailySales.product_id,
+            func.sum(DailySales.revenue).label("total_revenue")
+        )
+        .filter(DailySales.sale_date >= date_from)
+        .filter(DailySales.sale_date <= date_to)
+        .group_by(DailySales.sale_date, DailySales.product_id)
+    )
+
+
+def load_sales_matrix(session, date_from, date_to, columns):
+    """Загружает выручку за период одним запросом к дневной сводке в матрицу дни × продукты.
+
+    Возвращает (даты, матрица) или (None, None), если продаж за период нет.
+    """
+    started = time.perf_counter()
+    results = sales_matrix_query(session, date_from, date_to).all()
+    logger.debug(f"Найдено записей продаж: {len(results)}")
+    if not results:
+        return None, None
+
+    order_dates, product_ids, revenues = zip(*((r[0], r[1], r[2] or 0) for r in results))
+    ds = pd.date_range(date_from, date_to)
+    matrix = build_sales_matrix(order_dates, product_ids, revenues, date_from, len(ds), columns)
+    logger.info(
+        f"Матрица продаж {matrix.shape[0]}×{matrix.shape[1]}: {matrix.nbytes / 2 ** 20:.1f} МБ, "
+        f"{(time.perf_counter() - started) * 1000:.0f} мс"
+    )
+    return ds, matrix
+
+
+HIERARCHY_LEVELS = {
+    "": "По продуктам",
+    "category": "По категориям",
+    "brand": "По брендам",
+}
+
+
+class ForecastHierarchy:
+    """Иерархия рядов прогноза: модели обучаются по группам продуктов (категориям или брендам).
+
+    Прогноз группы распределяется между её продуктами пропорционально их доле в продажах
+    за последние share_window дней, поэтому сумма прогнозов продуктов равна прогнозу группы.
+    Без уровня (level="") каждый продукт образует отдельный ряд.
+    """
+
+    def __init__(self, ds, history, product_ids, product_info, level="", share_window=28):
+        """history — матрица продаж (дни × продукты) в порядке product_ids, ds — её даты."""
+        self.level = level or ""
+        self.ds = ds
+        self.history = history
+        self.product_ids = list(product_ids)
+        columns = {pid: j for j, pid in enumerate(self.product_ids)}
+
+        if self.level:
+            self.members = {}
+            for pid in self.product_ids:
+                self.members.setdefault(f"{self.level}:{product_info[pid][self.level]}", []).append(pid)
+        else:
+            self.members = {pid: [pid] for pid in self.product_ids}
+        self.member_columns = {key: [columns[pid] for pid in pids] for key, pids in self.members.items()}
+
+        # Доли продуктов внутри группы по недавним продажам (или по всей истории, если их не было)
+        recent = self.history[-share_window:].sum(axis=0)
+        total = self.history.sum(axis=0)
+        self.shares = {}
+        for key, cols in self.member_columns.items():
+            weights = recent[cols] if recent[cols].sum() > 0 else total[cols]
+            self.shares[key] = weights / weights.sum()
+
+    def series_history(self):
+        """Матрица истории рядов (дни × ряды) в порядке self.members."""
+        return np.column_stack([self.history[:, cols].sum(axis=1) for cols in self.member_columns.values()])
+
+    def series_inputs(self):
+        """Входные данные Prophet для каждого ряда: {ключ ряда: DataFrame(ds, y)}.
+
+        Для отдельных продуктов столбец y — представление столбца матрицы истории без копирования.
+        """
+        if not self.level:
+            return {
+                pid: pd.DataFrame({"ds": self.ds, "y": self.history[:, j]}, copy=False)
+                for j, pid in enumerate(self.product_ids)
+            }
+        return {
+            key: pd.DataFrame({"ds": self.ds, "y": self.history[:, cols].sum(axis=1)}, copy=False)
+            for key, cols in self.member_columns.items()
+        }
+
+    def series_watermark(self, key, sales_watermarks):
+        """Водяной знак ряда: максимум водяных знаков входящих в него продуктов."""
+        marks = [sales_watermarks[pid] for pid in self.members[key] if pid in sales_watermarks]
+        if not marks:
+            return None, None
+        return max(m[0] for m in marks), max(m[1] for m in marks)
+
+    def disaggregate(self, keys, series_yhat):
+        """Распределяет прогноз рядов (дни × ряды keys) по продуктам.
+
+        Возвращает список продуктов и матрицу прогноза (дни × продукты).
+        """
+        product_ids = [pid for key in keys for pid in self.members[key]]
+        series_col = np.repeat(np.arange(len(keys)), [len(self.members[key]) for key in keys])
+        shares = np.concatenate([self.shares[key] for key in keys])
+        return product_ids, series_yhat[:, series_col] * shares[None, :]
+
+
+class ForecastAdjustments:
+    """Корректировки прогноза (сезон, акции, срок годности, pH, активность клиентов) в виде массивов NumPy.
+
+    Маски и множители считаются один раз для всей сетки даты × продукты, после чего прогноз
+    корректируется одним выражением с broadcasting для любого набора столбцов.
+    """
+
+    SEASON_MONTHS = [3, 4, 5, 9, 10, 11]
+
+    def __init__(self, forecast_dates, product_ids, product_info, activities, client_activity_adj):
+        """activities — список кортежей (start_date, end_date, множество product_id акции)."""
+        self.forecast_dates = forecast_dates
+        self.product_ids = list(product_ids)
+        self.columns = {pid: j for j, pid in enumerate(self.product_ids)}
+        date_ordinals = np.array([d.toordinal() for d in forecast_dates])
+
+        months = np.array([d.month for d in forecast_dates])
+        self.monthly_adj = np.where(np.isin(months, self.SEASON_MONTHS), 1.1, 1.0)
+
+        promo_mask = np.zeros((len(forecast_dates), len(self.product_ids)), dtype=bool)
+        any_promo = np.zeros(len(forecast_dates), dtype=bool)
+        for start, end, activity_products in activities:
+            in_range = (date_ordinals >= start.toordinal()) & (date_ordinals <= end.toordinal())
+            any_promo |= in_range
+            cols = [self.columns[pid] for pid in activity_products if pid in self.columns]
+            promo_mask[np.ix_(in_range, cols)] = True
+        self.marketing_adj = np.where(promo_mask, 1.1, 1.0)
+        self.promo_dates = any_promo
+
+        expiry = np.array([
+            info["shelf_life"].toordinal() if isinstance(info["shelf_life"], date) else np.inf
+            for info in (product_info[pid] for pid in self.product_ids)
+        ])
+        self.shelf_life_adj = np.where(expiry[None, :] <= date_ordinals[:, None], 0.5, 1.0)
+
+        ph = np.array([product_info[pid]["ph_level"] or np.nan for pid in self.product_ids], dtype=float)
+        self.ph_adj = np.where((ph >= 5.0) & (ph <= 6.0), 1.2, 1.0)
+
+        self.client_activity_adj = client_activity_adj
+        self.plan_factor = np.where(any_promo, 1.05 + 0.05, 1.05)
+
+    def apply(self, yhat, product_ids=None):
+        """Корректирует матрицу yhat (даты × продукты) и возвращает матрицы прогноза и плана.
+
+        product_ids задаёт продукты, соответствующие столбцам yhat (по умолчанию — все).
+        """
+        cols = slice(None) if product_ids is None else [self.columns[pid] for pid in product_ids]
+        forecast = np.maximum(
+            yhat * self.monthly_adj[:, None] * self.marketing_adj[:, cols] * self.shelf_life_adj[:, cols]
+            * self.ph_adj[None, cols] * self.client_activity_adj,
+            0)
+        plan = forecast * self.plan_factor[:, None]
+        return forecast, plan
+
+    def to_rows(self, forecast, plan, product_ids, product_info):
+        """Разворачивает матрицы прогноза и плана в строки таблицы."""
+        return [
+            {
+                'date': f_date,
+                'product_id': product_id,
+                'product_name': product_info[product_id]["name"],
+                'forecast': float(forecast[i, j]),
+                'plan': float(plan[i, j])
+            }
+            for j, product_id in enumerate(product_ids)
+            for i, f_date in enumerate(self.forecast_dates)
+        ]
+
+
+def client_activity_query(session, date_from, date_to):
+    """Число строк заказов и средний чек по клиентам за период."""
+    return (
+        session.query(
+            Order.client_id.label("id"),
+            func.count(Order.id).label("order_count"),
+            func.avg(OrderItem.quantity * OrderItem.price).label("avg_check")
+        )
+        .join(OrderItem, Order.id == OrderItem.order_id)
+        .filter(Order.order_date >= date_from)
+        .filter(Order.order_date <= date_to)
+        .group_by(Order.client_id)
+    )
+
+
+def get_client_activity(session, date_from, date_to):
+    """Анализ активности клиентов из CRM."""
+    try:
+        results = client_activity_query(session, date_from, date_to).all()
+        client_activity = {r.id: {"order_count": r.order_count, "avg_check": r.avg_check or 0} for r in results}
+        logger.debug(f"Найдено активностей клиентов: {len(client_activity)}")
+        return client_activity
+    except Exception as e:
+        logger.error(f"Ошибка получения активности клиентов: {str(e)}")
+        return {}
+
+
+def sales_watermarks_query(session, date_from, date_to):
+    """Максимальные Order.id и order_date по продуктам за период."""
+    return (
+        session.query(
+            OrderItem.product_id,
+            func.max(Order.id).label("max_order_id"),
+            func.max(Order.order_date).label("max_order_date")
+        )
+        .join(Order, Order.id == OrderItem.order_id)
+        .filter(Order.order_date >= date_from)
+        .filter(Order.order_date <= date_to)
+        .group_by(OrderItem.product_id)
+    )
+
+
+def get_sales_watermarks(session, date_from, date_to):
+    """Возвращает водяные знаки обучающих данных: {product_id: (max Order.id, max order_date)}."""
+    query = sales_watermarks_query(session, date_from, date_to)
+    return {r.product_id: (r.max_order_id, r.max_order_date) for r in query.all()}
+
+
+def marketing_activities_query(session, date_from, date_to):
+    """Акции, пересекающиеся с периодом, с продуктами акции (по строке на продукт)."""
+    return (
+        session.query(
+            MarketingActivity.id,
+            MarketingActivity.start_date,
+            MarketingActivity.end_date,
+            ActivityProduct.product_id
+        )
+        .outerjoin(ActivityProduct, ActivityProduct.activity_id == MarketingActivity.id)
+        .filter(MarketingActivity.start_date <= date_to)
+        .filter(MarketingActivity.end_date >= date_from)
+    )
+
+
+def get_marketing_activities(session, date_from, date_to):
+    """Акции, пересекающиеся с периодом: список (start_date, end_date, множество product_id)."""
+    activities = {}
+    for r in marketing_activities_query(session, date_from, date_to).all():
+        _, _, product_ids = activities.setdefault(r.id, (r.start_date, r.end_date, set()))
+        if r.product_id is not None:
+            product_ids.add(r.product_id)
+    return list(activities.values())
+
+
+def sales_plan_keys_query(session, date_from, date_to):
+    """Ключи (plan_date, product_id) сохранённых планов за период."""
+    return (
+        session.query(SalesPlan.plan_date, SalesPlan.product_id)
+        .filter(SalesPlan.plan_date >= date_from)
+        .filter(SalesPlan.plan_date <= date_to)
+    )
+
+
+def save_sales_plan(session, forecast_data, chunk_size=500):
+    """Сохраняет прогноз и план в sales_plan одним upsert (INSERT ... ON CONFLICT DO UPDATE).
+
+    Строки отправляются через executemany пачками по chunk_size. Возвращает число
+    новых и обновлённых записей. Фиксацию транзакции выполняет вызывающий код.
+    """
+    keys = {(data['date'], data['product_id']) for data in forecast_data}
+    plan_dates = [plan_date for plan_date, _ in keys]
+    existing = {tuple(r) for r in sales_plan_keys_query(session, min(plan_dates), max(plan_dates))}
+    updated_count = len(keys & existing)
+    saved_count = len(keys) - updated_count
+
+    table = SalesPlan.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.plan_date, table.c.product_id],
+        set_={
+            "planned_quantity": stmt.excluded.planned_quantity,
+            "forecast_quantity": stmt.excluded.forecast_quantity,
+        }
+    )
+    params = [
+        {
+            "plan_date": data['date'],
+            "product_id": data['product_id'],
+            "planned_quantity": round(data['plan'], 2),
+            "forecast_quantity": round(data['forecast'], 2),
+        }
+        for data in forecast_data
+    ]
+    for start in range(0, len(params), chunk_size):
+        session.execute(stmt, params[start:start + chunk_size])
+    bump_data_versions(session, plan_dates)
+    logger.debug(f"Upsert sales_plan: {len(params)} строк пачками по {chunk_size}")
+    return saved_count, updated_count
+
+
+class ForecastCancelled(Exception):
+    """Построение прогноза отменено пользователем."""
+
+
+class ForecastDataError(Exception):
+    """В базе недостаточно данных для построения прогноза."""
+
+
+class ForecastService:
+    """Конвейер прогноза спроса и плана продаж, не зависящий от интерфейса.
+
+    Используется виджетом прогноза (в фоновом потоке) и ночным заданием forecast_job.
+    О ходе работы сообщает через необязательные колбэки метода run.
+    """
+
+    def __init__(self, max_workers=FORECAST_WORKERS, forecast_days=30, model_store=None, engine=FORECAST_ENGINE,
+                 hierarchy_level=FORECAST_HIERARCHY, history_days=365, cancel_event=None):
+        self.max_workers = max_workers
+        self.forecast_days = forecast_days
+        self.model_store = model_store
+        self.engine = engine
+        self.hierarchy_level = hierarchy_level
+        self.history_days = history_days
+        self.cancel_event = cancel_event if cancel_event is not None else threading.Event()
+        self.on_prepared = self.on_rows = self.on_progress = None
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise ForecastCancelled()
+
+    def run(self, session, start_date=None, on_prepared=None, on_rows=None, on_progress=None):
+        """Строит прогноз на forecast_days дней начиная с start_date (по умолчанию — сегодня).
+
+        on_prepared(context) вызывается перед обучением моделей, on_rows(rows) — по мере
+        готовности прогнозов, on_progress(done, total) — после каждого обученного ряда.
+        Возвращает все строки прогноза, упорядоченные по дате и продукту.
+        """
+        rows = []
+        product_order = {}
+
+        def prepared(context):
+            product_order.update({pid: i for i, pid in enumerate(context["product_order"])})
+            if on_prepared is not None:
+                on_prepared(context)
+
+        def rows_ready(product_rows):
+            rows.extend(product_rows)
+            if on_rows is not None:
+                on_rows(product_rows)
+
+        self.on_prepared = prepared
+        self.on_rows = rows_ready
+        self.on_progress = on_progress or (lambda done, total: None)
+        self.build(session, start_date or date.today())
+        rows.sort(key=lambda d: (d['date'], product_order[d['product_id']]))
+        return rows
+
+    def build(self, session, today):
+        """Строит прогноз спроса и план продаж по продуктам."""
+        logger.debug("Начало построения прогноза и плана по продуктам")
+        forecast_days = self.forecast_days
+        forecast_dates = [today + timedelta(days=i) for i in range(forecast_days)]
+        date_to = today - timedelta(days=1)
+        date_from = date_to - timedelta(days=self.history_days)
+
+        # Получение данных о товарах
+        products = session.query(Product).all()
+        logger.debug(f"Найдено продуктов: {len(products)}")
+        if not products:
+            logger.warning("Нет данных о продуктах")
+            raise ForecastDataError("Нет данных о продуктах в базе.")
+
+        product_info = {}
+        for p in products:
+            # Преобразование shelf_life из строки в datetime.date, если необходимо
+            shelf_life = p.shelf_life
+            if isinstance(shelf_life, str):
+                try:
+                    shelf_life = datetime.strptime(shelf_life, "%Y-%m-%d").date()
+                    logger.debug(f"Преобразовано shelf_life для продукта ID={p.id}: {shelf_life}")
+                except ValueError:
+                    logger.warning(f"Некорректный формат shelf_life для продукта ID={p.id}: {shelf_life}")
+                    shelf_life = None
+            product_info[p.id] = {
+                "name": p.name,
+                "category": p.category,
+                "brand": p.brand,
+                "shelf_life": shelf_life,
+                "ph_level": p.ph_level
+            }
+
+        # Исторические данные о продажах: плотная матрица дни × продукты
+        ds, matrix = load_sales_matrix(session, date_from, date_to, list(product_info.keys()))
+        if matrix is None:
+            logger.warning("Нет данных о продажах")
+            raise ForecastDataError("Нет данных о продажах за указанный период.")
+
+        # Продукты без выручки за период не прогнозируются
+        has_sales = matrix.sum(axis=0) > 0
+        product_ids = [pid for pid, keep in zip(product_info.keys(), has_sales) if keep]
+        logger.debug(f"Пропущено продуктов с нулевой выручкой: {len(product_info) - len(product_ids)}")
+        if not product_ids:
+            logger.warning("Нет данных для прогноза")
+            raise ForecastDataError("Нет ненулевой выручки для продуктов.")
+        if not has_sales.all():
+            matrix = np.asfortranarray(matrix[:, has_sales])
+        self.check_cancelled()
+
+        # Учет активности клиентов
+        client_activity = get_client_activity(session, date_from, date_to)
+        avg_order_count = np.mean([v["order_count"] for v in client_activity.values()]) if client_activity else 1
+        client_adj = {cid: 1 + 0.05 * (act["order_count"] - avg_order_count) / (avg_order_count or 1)
+                      for cid, act in client_activity.items()}
+        client_activity_adj = np.mean(list(client_adj.values())) if client_adj else 1.0
+
+        # Учет маркетинговых активностей
+        activities = get_marketing_activities(session, min(forecast_dates), max(forecast_dates))
+        logger.debug(f"Найдено маркетинговых активностей: {len(activities)}")
+        adjustments = ForecastAdjustments(
+            forecast_dates, product_ids, product_info, activities, client_activity_adj
+        )
+        marked_dates = [f_date for f_date, promo in zip(forecast_dates, adjustments.promo_dates) if promo]
+
+        self.on_prepared({
+            "forecast_dates": forecast_dates,
+            "marked_dates": marked_dates,
+            "product_order": product_ids,
+        })
+
+        hierarchy = ForecastHierarchy(ds, matrix, product_ids, product_info, self.hierarchy_level)
+        if hierarchy.level:
+            logger.info(f"Иерархический прогноз ({hierarchy.level}): {len(hierarchy.members)} рядов "
+                        f"вместо {len(product_ids)} продуктов")
+        if self.engine == ENGINE_HOLT_WINTERS:
+            self.run_holt_winters(hierarchy, forecast_dates, adjustments, product_info)
+        else:
+            self.run_prophet(session, hierarchy, forecast_dates, date_from, date_to, adjustments, product_info)
+        self.check_cancelled()
+
+    def run_prophet(self, session, hierarchy, forecast_dates, date_from, date_to, adjustments, product_info):
+        """Обучает Prophet по каждому ряду иерархии и отдаёт результаты по мере готовности."""
+        series_inputs = hierarchy.series_inputs()
+
+        # Модели рядов без новых продаж берутся из кэша, остальные обучаются заново
+        cached_models = {}
+        watermarks = {}
+        if self.model_store is not None:
+            self.model_store.reset_stats()
+            sales_watermarks = get_sales_watermarks(session, date_from, date_to)
+            for key in series_inputs:
+                watermarks[key] = self.model_store.make_watermark(
+                    self.history_days, *hierarchy.series_watermark(key, sales_watermarks)
+                )
+                model_json = self.model_store.lookup(key, watermarks[key])
+                if model_json is not None:
+                    cached_models[key] = model_json
+
+        done = 0
+        self.on_progress(done, len(series_inputs))
+        for key, forecast, model_json in iter_forecasts(
+                series_inputs, forecast_dates, self.max_workers, self.cancel_event, cached_models):
+            if model_json is not None and self.model_store is not None:
+                self.model_store.save(key, watermarks[key], model_json)
+            product_ids, yhat = hierarchy.disaggregate([key], forecast["yhat"].to_numpy()[:, None])
+            product_forecast, product_plan = adjustments.apply(yhat, product_ids)
+            rows = adjustments.to_rows(product_forecast, product_plan, product_ids, product_info)
+            done += 1
+            self.on_rows(rows)
+            self.on_progress(done, len(series_inputs))
+        if self.model_store is not None:
+            self.model_store.log_stats()
+
+    def run_holt_winters(self, hierarchy, forecast_dates, adjustments, product_info):
+        """Строит прогноз сразу по всем рядам иерархии одной матрицей (дни × ряды)."""
+        keys = list(hierarchy.members)
+        self.on_progress(0, len(keys))
+        series_yhat = holt_winters_forecast(hierarchy.series_history(), len(forecast_dates))
+        product_ids, yhat = hierarchy.disaggregate(keys, series_yhat)
+        forecast, plan = adjustments.apply(yhat, product_ids)
+        self.on_rows(adjustments.to_rows(forecast, plan, product_ids, product_info))
+        self.on_progress(len(keys), len(keys))
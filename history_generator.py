@@ -0,0 +1,254 @@
+"""Векторный генератор синтетической истории заказов.
+
+Заказы и строки заказов порождаются массивами NumPy: число заказов в день с недельной и
+годовой сезонностью, выбор клиентов, продуктов (по популярности), количеств и сумм строк.
+История делится на партиции по PARTITION_DAYS дней, которые генерируются в пуле
+процессов. Генератор каждой партиции получает собственный SeedSequence, производный от
+seed и номера партиции, поэтому результат не зависит от числа процессов, а при одинаковых
+параметрах, включая дату конца истории end_date, база получается побайтно одинаковой.
+Партиции вливаются в SQLite по порядку пакетными вставками executemany.
+
+Пример запуска:
+    python history_generator.py --db bench.db --products 1000 --days 365 --orders-per-day 9000 \
+        --end-date 2025-01-01
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from data_simulator import (
+    Base, Product, Client, Order, OrderItem, MarketingActivity, ActivityProduct, insert_batches, clear_data,
+    refresh_daily_sales
+)
+from migrations import migrate
+
+logger = logging.getLogger(__name__)
+
+# Число дней истории в одной партиции генератора
+PARTITION_DAYS = 28
+
+CATEGORIES = ["Крем", "Сыворотка", "Филлер"]
+REGIONS = ["Москва", "Санкт-Петербург", "Регионы"]
+
+# Множители спроса по дням недели (понедельник — воскресенье)
+WEEKLY_PROFILE = np.array([1.0, 1.05, 1.1, 1.1, 1.15, 0.85, 0.75])
+# Размах годовой сезонности и день года её пика (предновогодний спрос)
+YEARLY_AMPLITUDE = 0.25
+YEARLY_PEAK_DAY = 350
+
+
+def partition_rng(seed, partition):
+    """Генератор партиции; номер 0 зарезервирован за справочниками."""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(partition,)))
+
+
+def demand_multiplier(days):
+    """Сезонный множитель спроса для номеров дней от 1970-01-01."""
+    weekday = (days + 3) % 7  # 1970-01-01 — четверг
+    yearly = 1 + YEARLY_AMPLITUDE * np.cos(2 * np.pi * (days - YEARLY_PEAK_DAY) / 365.25)
+    return WEEKLY_PROFILE[weekday] * yearly
+
+
+def generate_partition(task):
+    """Генерирует заказы партиции; ключи локальные (с нуля), их сдвигает сборщик.
+
+    task: (seed, номер партиции, первый день, число дней, заказов в день, число клиентов,
+    цены продуктов, веса популярности продуктов).
+    """
+    seed, partition, first_day, n_days, orders_per_day, n_clients, prices, weights = task
+    rng = partition_rng(seed, partition)
+    days = np.arange(first_day, first_day + n_days, dtype=np.int64)
+    orders_count = rng.poisson(orders_per_day * demand_multiplier(days))
+    order_days = np.repeat(days, orders_count)
+    order_clients = rng.integers(1, n_clients + 1, size=len(order_days), dtype=np.int32)
+
+    items_count = rng.integers(1, 6, size=len(order_days))
+    item_orders = np.repeat(np.arange(len(order_days), dtype=np.int32), items_count)
+    item_products = rng.choice(len(prices), size=len(item_orders), p=weights).astype(np.int32)
+    item_quantity = rng.integers(1, 11, size=len(item_orders), dtype=np.int32)
+    item_price = np.round(prices[item_products] * item_quantity, 2)
+    return order_days, order_clients, item_orders, item_products + 1, item_quantity, item_price
+
+
+def generate_reference(seed, n_products, n_clients):
+    """Справочники продуктов и клиентов: (строки products, строки clients, цены, веса популярности)."""
+    rng = partition_rng(seed, 0)
+    categories = rng.integers(0, len(CATEGORIES), size=n_products)
+    prices = np.round(rng.uniform(1000, 10000, size=n_products), 2)
+    shelf_life = rng.integers(30, 366, size=n_products)
+    sensitive = rng.integers(0, 2, size=n_products)
+    brands = rng.integers(1, 11, size=n_products)
+    stock = rng.integers(10, 101, size=n_products)
+    ph = np.round(rng.uniform(4.5, 7.5, size=n_products), 1)
+    products = [
+        {
+            "id": i + 1,
+            "name": f"Продукт {i+1}",
+            "category": CATEGORIES[categories[i]],
+            "price": float(prices[i]),
+            "shelf_life": int(shelf_life[i]),
+            "temperature_sensitive": bool(sensitive[i]),
+            "brand": f"Бренд {brands[i]}",
+            "stock_quantity": int(stock[i]),
+            "ph_level": float(ph[i]) if CATEGORIES[categories[i]] in ["Крем", "Сыворотка"] else None
+        }
+        for i in range(n_products)
+    ]
+    client_types = rng.integers(0, 2, size=n_clients)
+    regions = rng.integers(0, len(REGIONS), size=n_clients)
+    clients = [
+        {
+            "id": i + 1,
+            "name": f"Клиент {i+1}",
+            "client_type": ["косметолог", "клиника"][client_types[i]],
+            "region": REGIONS[regions[i]]
+        }
+        for i in range(n_clients)
+    ]
+    # Популярность продуктов убывает по закону Ципфа в случайном порядке
+    weights = 1.0 / np.arange(1, n_products + 1) ** 0.8
+    weights = rng.permutation(weights)
+    return products, clients, prices, weights / weights.sum()
+
+
+def insert_arrays(connection, table, columns, batch_size):
+    """Вставляет столбцы-массивы одной таблицы через executemany драйвера пачками по batch_size."""
+    sql = f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    lists = [column.tolist() for column in columns.values()]
+    rows = list(zip(*lists))
+    for i in range(0, len(rows), batch_size):
+        connection.exec_driver_sql(sql, rows[i:i + batch_size])
+    return len(rows)
+
+
+def generate_history(session, n_products=100, n_clients=50, history_days=365, orders_per_day=10, seed=0,
+                     workers=None, batch_size=50000, end_date=None):
+    """Заполняет базу синтетической историей; возвращает {таблица: (число строк, секунды)}.
+
+    История занимает history_days дней до end_date (не включая его; по умолчанию — сегодня).
+    Для воспроизводимого набора данных end_date нужно задать явно: от него отсчитываются
+    даты заказов, сезонность и акции. Существующие данные удаляются, как в
+    DataSimulator.populate_initial_data.
+    """
+    end_date = end_date or date.today()
+    logger.info(f"Генерация истории: {n_products} продуктов, {history_days} дней до {end_date}, seed {seed}")
+    clear_data(session)
+    stats = {}
+
+    started = time.perf_counter()
+    products, clients, prices, weights = generate_reference(seed, n_products, n_clients)
+    stats["products"] = insert_batches(session, Product.__table__, products, batch_size, started)
+    started = time.perf_counter()
+    stats["clients"] = insert_batches(session, Client.__table__, clients, batch_size, started)
+
+    start_date = end_date - timedelta(days=history_days)
+    first_day = int(np.datetime64(start_date, "D").astype(np.int64))
+    tasks = [
+        (seed, index + 1, first_day + offset, min(PARTITION_DAYS, history_days - offset), orders_per_day, n_clients,
+         prices, weights)
+        for index, offset in enumerate(range(0, history_days, PARTITION_DAYS))
+    ]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+
+    started = time.perf_counter()
+    order_id = item_id = 0
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        partitions = executor.map(generate_partition, tasks)
+    else:
+        partitions = map(generate_partition, tasks)
+    try:
+        # Партиции вливаются в порядке дат, пока следующие ещё генерируются
+        connection = session.connection()
+        for order_days, order_clients, item_orders, item_products, item_quantity, item_price in partitions:
+            order_ids = np.arange(order_id + 1, order_id + len(order_days) + 1)
+            insert_arrays(connection, Order.__table__, {
+                "id": order_ids,
+                "client_id": order_clients,
+                "order_date": np.datetime_as_string(order_days.astype("datetime64[D]")),
+                "status": np.full(len(order_days), "Выполнен"),
+            }, batch_size)
+            insert_arrays(connection, OrderItem.__table__, {
+                "id": np.arange(item_id + 1, item_id + len(item_orders) + 1),
+                "order_id": item_orders + order_id + 1,
+                "product_id": item_products,
+                "quantity": item_quantity,
+                "price": item_price,
+            }, batch_size)
+            session.commit()
+            connection = session.connection()
+            order_id += len(order_days)
+            item_id += len(item_orders)
+            logger.debug(f"Вставлено {item_id} строк заказов")
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    elapsed = time.perf_counter() - started
+    stats["orders"] = (order_id, elapsed)
+    stats["order_items"] = (item_id, elapsed)
+    logger.info(
+        f"Таблицы orders и order_items заполнены: {order_id} заказов, {item_id} строк за {elapsed:.1f} с "
+        f"в {workers} процессах ({(order_id + item_id) / elapsed if elapsed else 0:.0f} строк/с)"
+    )
+
+    refresh_daily_sales(session, start_date, history_days)
+
+    rng = partition_rng(seed, len(tasks) + 1)
+    activities, activity_products = [], []
+    for i in range(10):
+        activity_start = end_date - timedelta(days=int(rng.integers(10, 31)))
+        activities.append({
+            "id": i + 1,
+            "name": f"Акция {i+1000}",
+            "start_date": activity_start,
+            "end_date": activity_start + timedelta(days=int(rng.integers(5, 16))),
+            "description": f"Скидки на товары {i+1}"
+        })
+        for product_index in rng.choice(n_products, size=min(5, n_products), replace=False):
+            activity_products.append({"activity_id": i + 1, "product_id": int(product_index) + 1})
+    insert_batches(session, MarketingActivity.__table__, activities, batch_size)
+    insert_batches(session, ActivityProduct.__table__, activity_products, batch_size)
+    logger.info("Таблицы marketing_activities и activity_products заполнены")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Генерация синтетической истории заказов")
+    parser.add_argument("--db", default="pm_demo.db", help="файл базы данных SQLite")
+    parser.add_argument("--products", type=int, default=100, help="число продуктов")
+    parser.add_argument("--clients", type=int, default=50, help="число клиентов")
+    parser.add_argument("--days", type=int, default=365, help="глубина истории в днях")
+    parser.add_argument("--orders-per-day", type=float, default=10, help="среднее число заказов в день")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--end-date", type=date.fromisoformat, default=None,
+                        help="день после конца истории, ГГГГ-ММ-ДД (по умолчанию сегодня)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="число процессов генерации")
+    parser.add_argument("--batch-size", type=int, default=50000, help="строк в одной вставке executemany")
+    args = parser.parse_args(argv)
+
+    engine = create_engine(f"sqlite:///{args.db}", echo=False)
+    migrate(engine, Base.metadata)
+    session = sessionmaker(bind=engine)()
+    try:
+        generate_history(
+            session, args.products, args.clients, args.days, args.orders_per_day, args.seed, args.workers,
+            args.batch_size, args.end_date
+        )
+    finally:
+        session.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    main()
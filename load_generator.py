@@ -0,0 +1,284 @@
+"""Генератор нагрузки записи: заказы с заданной интенсивностью и профилем всплесков.
+
+В отличие от DataSimulator, который лишь дополняет число сегодняшних заказов до 10,
+LoadGenerator пишет заказы с целевой скоростью (заказов в секунду), умноженной на профиль
+нагрузки. Справочники продуктов и клиентов кэшируются, заказы одного такта пишутся одной
+транзакцией пакетными вставками, запасы списываются и корректируются запросами UPDATE
+по множеству строк. Метрики (достигнутая скорость, процентили задержки фиксации, ошибки
+ожидания блокировки) пишутся в журнал и доступны через LoadGenerator.metrics.
+
+Пример запуска:
+    python load_generator.py --rate 200 --profile burst --seconds 60
+"""
+import argparse
+import logging
+import math
+import random
+import threading
+import time
+from collections import deque
+from datetime import date
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+
+from data_simulator import (
+    DataSimulator, WriteSession, Product, Client, Order, OrderItem, add_to_daily_sales, bump_data_versions,
+    apply_stock_changes, writer_busy, migrate_database
+)
+from change_feed import change_feed, OrderInserted
+
+logger = logging.getLogger(__name__)
+
+# Период такта генератора: заказы, накопленные за такт, пишутся одной транзакцией
+TICK_SECONDS = 0.05
+# Как часто перечитывать справочники продуктов и клиентов
+REFERENCE_TTL_SECONDS = 60
+# Во сколько раз растёт нагрузка во время всплеска профиля "burst"
+BURST_FACTOR = 5
+
+
+def steady_profile(elapsed):
+    return 1.0
+
+
+def burst_profile(elapsed):
+    """Всплеск в BURST_FACTOR раз первые 2 секунды каждых 10 секунд."""
+    return BURST_FACTOR if elapsed % 10 < 2 else 1.0
+
+
+def wave_profile(elapsed):
+    """Плавная волна с периодом в минуту: от 0.2 до 1.8 целевой скорости."""
+    return 1 + 0.8 * math.sin(2 * math.pi * elapsed / 60)
+
+
+# Профиль нагрузки -> множитель целевой скорости от времени с начала работы
+LOAD_PROFILES = {
+    "steady": steady_profile,
+    "burst": burst_profile,
+    "wave": wave_profile,
+}
+
+
+def is_lock_error(error):
+    return "locked" in str(error.orig) or "busy" in str(error.orig)
+
+
+class LoadMetrics:
+    """Скользящие метрики нагрузки за последние window секунд."""
+
+    def __init__(self, window=10.0):
+        self.window = window
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.commits = deque()          # (время фиксации, число заказов, задержка в секундах)
+        self.total_orders = 0
+        self.lock_errors = 0
+        self.errors = 0
+
+    def record_commit(self, orders, latency):
+        with self.lock:
+            now = time.perf_counter()
+            self.commits.append((now, orders, latency))
+            self.total_orders += orders
+            self.trim(now)
+
+    def record_error(self, lock_error):
+        with self.lock:
+            if lock_error:
+                self.lock_errors += 1
+            else:
+                self.errors += 1
+
+    def trim(self, now):
+        while self.commits and self.commits[0][0] < now - self.window:
+            self.commits.popleft()
+
+    def snapshot(self):
+        """Текущие метрики: скорость заказов/с, задержки фиксации p50/p95/p99 (мс), счётчики ошибок."""
+        with self.lock:
+            now = time.perf_counter()
+            self.trim(now)
+            span = min(self.window, now - self.started) or 1.0
+            latencies = np.array([c[2] for c in self.commits]) * 1000
+            orders = sum(c[1] for c in self.commits)
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0.0, 0.0, 0.0)
+            return {
+                "rate": orders / span,
+                "commits": len(latencies),
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "total_orders": self.total_orders,
+                "lock_errors": self.lock_errors,
+                "errors": self.errors,
+            }
+
+
+class LoadGenerator(DataSimulator):
+    """Режим DataSimulator с заданной скоростью записи заказов.
+
+    Скорость регулируется «кредитом»: за каждый такт начисляется rate × профиль × длительность
+    такта заказов, целая часть пишется одной транзакцией. Если база не успевает, кредит
+    ограничивается секундой нагрузки, а достигнутая скорость в метриках отстаёт от цели.
+    """
+
+    def __init__(self, rate=50.0, profile="steady", inventory_interval=1.0, metrics_interval=5.0):
+        super().__init__(interval_seconds=TICK_SECONDS)
+        if profile not in LOAD_PROFILES:
+            raise ValueError(f"Неизвестный профиль нагрузки: {profile}")
+        self.rate = rate
+        self.profile = profile
+        self.inventory_interval = inventory_interval
+        self.metrics_interval = metrics_interval
+        self.metrics = LoadMetrics()
+        self.product_ids = []
+        self.prices = []
+        self.client_ids = []
+        self.reference_loaded = None
+
+    def target_rate(self, elapsed):
+        return self.rate * LOAD_PROFILES[self.profile](elapsed)
+
+    def load_reference(self, session):
+        products = session.query(Product.id, Product.price).all()
+        self.product_ids = [product_id for product_id, _ in products]
+        self.prices = [price or 0.0 for _, price in products]
+        self.client_ids = [client_id for client_id, in session.query(Client.id).all()]
+        self.reference_loaded = time.perf_counter()
+        logger.debug(f"Справочники загружены: {len(self.product_ids)} продуктов, {len(self.client_ids)} клиентов")
+
+    def run(self):
+        """Цикл генерации нагрузки до вызова stop()."""
+        session = WriteSession()
+        try:
+            self.load_reference(session)
+            session.commit()
+            if not self.product_ids or not self.client_ids:
+                logger.warning("Нет клиентов или продуктов для генерации нагрузки")
+                return
+            self.metrics = LoadMetrics()
+            started = last = last_inventory = last_log = time.perf_counter()
+            credit = 0.0
+            while self.running:
+                now = time.perf_counter()
+                target = self.target_rate(now - started)
+                credit = min(credit + (now - last) * target, max(target, 1.0))
+                last = now
+                due = int(credit)
+                if due:
+                    credit -= due
+                    self.write(session, self.write_orders, due)
+                if now - last_inventory >= self.inventory_interval:
+                    last_inventory = now
+                    self.write(session, self.adjust_inventory)
+                if now - self.reference_loaded >= REFERENCE_TTL_SECONDS:
+                    self.load_reference(session)
+                    session.commit()
+                if now - last_log >= self.metrics_interval:
+                    last_log = now
+                    self.log_metrics(target)
+                time.sleep(max(0.0, TICK_SECONDS - (time.perf_counter() - now)))
+        finally:
+            WriteSession.remove()
+
+    def write(self, session, action, *args):
+        """Выполняет транзакцию записи, учитывая её задержку и ошибки блокировки."""
+        writer_busy.set()
+        started = time.perf_counter()
+        try:
+            orders = action(session, *args)
+        except OperationalError as e:
+            session.rollback()
+            lock_error = is_lock_error(e)
+            self.metrics.record_error(lock_error)
+            if not lock_error:
+                logger.error(f"Ошибка генератора нагрузки: {e}")
+        except Exception as e:
+            session.rollback()
+            self.metrics.record_error(False)
+            logger.error(f"Ошибка генератора нагрузки: {e}")
+        else:
+            if orders:
+                self.metrics.record_commit(orders, time.perf_counter() - started)
+        finally:
+            writer_busy.clear()
+
+    def write_orders(self, session, count):
+        """Пишет count сегодняшних заказов одной транзакцией; возвращает число заказов."""
+        current_date = date.today()
+        clients = random.choices(self.client_ids, k=count)
+        order_ids = session.execute(
+            insert(Order).returning(Order.id, sort_by_parameter_order=True),
+            [{"client_id": client_id, "order_date": current_date, "status": "Выполнен"} for client_id in clients]
+        ).scalars().all()
+
+        item_rows = []
+        order_items = {}
+        client_items = {}
+        sold = {}
+        for order_id, client_id in zip(order_ids, clients):
+            for _ in range(random.randint(1, 5)):
+                index = random.randrange(len(self.product_ids))
+                product_id = self.product_ids[index]
+                quantity = random.randint(1, 10)
+                price = round(self.prices[index] * quantity, 2)
+                item_rows.append(
+                    {"order_id": order_id, "product_id": product_id, "quantity": quantity, "price": price}
+                )
+                order_items.setdefault(order_id, []).append((product_id, quantity, price))
+                client_items.setdefault(client_id, []).append((product_id, quantity, price))
+                sold[product_id] = sold.get(product_id, 0) + quantity
+        session.execute(insert(OrderItem.__table__), item_rows)
+        for client_id, items in client_items.items():
+            add_to_daily_sales(session, current_date, client_id, items)
+
+        # Списание проданного количества одним запросом на все продукты заказов
+        stock_events = apply_stock_changes(session, {product_id: -quantity for product_id, quantity in sold.items()})
+        bump_data_versions(session, [current_date])
+        session.commit()
+        change_feed.publish([
+            OrderInserted(order_id, current_date, client_id, tuple(order_items[order_id]))
+            for order_id, client_id in zip(order_ids, clients)
+        ] + stock_events)
+        return count
+
+    def log_metrics(self, target):
+        m = self.metrics.snapshot()
+        logger.info(
+            f"Нагрузка: {m['rate']:.1f} заказов/с (цель {target:.1f}), фиксация p50 {m['p50_ms']:.1f} мс, "
+            f"p95 {m['p95_ms']:.1f} мс, p99 {m['p99_ms']:.1f} мс, ошибок блокировки {m['lock_errors']}, "
+            f"прочих ошибок {m['errors']}"
+        )
+
+    def stop(self):
+        super().stop()
+        m = self.metrics.snapshot()
+        logger.info(
+            f"Генератор нагрузки: записано {m['total_orders']} заказов, ошибок блокировки {m['lock_errors']}, "
+            f"прочих ошибок {m['errors']}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Генерация нагрузки записи заказов в pm_demo.db")
+    parser.add_argument("--rate", type=float, default=50, help="целевая скорость, заказов в секунду")
+    parser.add_argument("--profile", choices=sorted(LOAD_PROFILES), default="steady", help="профиль нагрузки")
+    parser.add_argument("--seconds", type=float, default=60, help="длительность работы")
+    parser.add_argument("--metrics-interval", type=float, default=5, help="период вывода метрик, секунд")
+    args = parser.parse_args(argv)
+
+    migrate_database()
+    generator = LoadGenerator(args.rate, args.profile, metrics_interval=args.metrics_interval)
+    generator.start()
+    try:
+        time.sleep(args.seconds)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        generator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,17 @@
 import sys
+import multiprocessing
 from PyQt6.QtWidgets import QApplication, QMainWindow
 from interface import Ui_MainWindow
 from analytics_w import AnalyticsWidget
 from forecast_w import ForecastWidget
 from stok_w import StokWidget
 from main_tab import OverviewWidget
-from data_simulator import Session
+from data_simulator import DataSimulator, migrate_database
+from db import ReadSession
+from analytics_engine import SalesAnalyticsEngine
+from load_generator import LoadGenerator
+from change_signals import ChangeBatcher
+from settings import SIMULATE, SIMULATE_RATE, SIMULATE_PROFILE, ANALYTICS_BACKEND
 
 
 class MainWindow(QMainWindow):
@@ -14,10 +20,12 @@ class MainWindow(QMainWindow):
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
 
-        self.session = Session()
+        # Сессия потока интерфейса; фоновые потоки открывают свои короткие сессии
+        self.session = ReadSession()
 
         # Центральные виджеты
-        self.analytics_widget = AnalyticsWidget(self.session)
+        analytics_engine = SalesAnalyticsEngine() if ANALYTICS_BACKEND == "memory" else None
+        self.analytics_widget = AnalyticsWidget(self.session, analytics_engine=analytics_engine)
         self.prognoz_widget = ForecastWidget(self.session)
         self.inventory_widget = StokWidget(self.session)
 
@@ -36,9 +44,30 @@ class MainWindow(QMainWindow):
         self.ui.listWidget.setCurrentRow(0)
         self.ui.topTabList.setCurrentRow(0)
 
+        # Изменения от симулятора доставляются виджетам пачками
+        self.change_batcher = ChangeBatcher(parent=self)
+        self.change_batcher.changed.connect(self.analytics_widget.apply_changes)
+        self.change_batcher.changed.connect(self.inventory_widget.apply_changes)
+
+        self.simulator = None
+        if SIMULATE:
+            if SIMULATE_RATE > 0:
+                self.simulator = LoadGenerator(SIMULATE_RATE, SIMULATE_PROFILE)
+            else:
+                self.simulator = DataSimulator()
+            self.simulator.start()
+
+    def closeEvent(self, event):
+        if self.simulator is not None:
+            self.simulator.stop()
+        self.change_batcher.stop()
+        super().closeEvent(event)
+
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
+    migrate_database()
     window = MainWindow()
     window.show()
     sys.exit(app.exec())
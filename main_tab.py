@@ -34,6 +34,7 @@ class OverviewWidget(QWidget):
 
         self.current_mode = "week"
         self.current_date = datetime.today().date()
+        self.last_step = -1
 
         self.init_ui()
         self.load_data_for_current_mode()
@@ -97,17 +98,40 @@ class OverviewWidget(QWidget):
         layout.addWidget(self.btn_next)
         layout.addStretch()
 
-    def load_data_for_current_mode(self):
+    def get_period(self, date):
+        """Границы периода текущего режима, содержащего дату."""
         if self.current_mode == "week":
-            start, end = self.get_week_range(self.current_date)
-        elif self.current_mode == "month":
-            start, end = self.get_month_range(self.current_date)
-        else:
-            start = end = self.current_date
+            return self.get_week_range(date)
+        if self.current_mode == "month":
+            return self.get_month_range(date)
+        return date, date
+
+    def shift_date(self, date, step):
+        """Дата в соседнем периоде текущего режима: step = -1 — предыдущий, 1 — следующий."""
+        if self.current_mode == "week":
+            return date + timedelta(days=7 * step)
+        if self.current_mode == "month":
+            year = date.year
+            month = date.month + step
+            if month < 1:
+                month = 12
+                year -= 1
+            elif month > 12:
+                month = 1
+                year += 1
+            return date.replace(year=year, month=month, day=1)
+        return date + timedelta(days=step)
+
+    def load_data_for_current_mode(self):
+        start, end = self.get_period(self.current_date)
 
         self.analytics_widget.date_from.setDate(QDate(start.year, start.month, start.day))
         self.analytics_widget.date_to.setDate(QDate(end.year, end.month, end.day))
         self.analytics_widget.build_report()
+        # Следующим скорее всего откроют период в том же направлении
+        self.analytics_widget.set_prefetch_periods([
+            self.get_period(self.shift_date(self.current_date, step)) for step in (self.last_step, -self.last_step)
+        ])
 
     def on_week_clicked(self):
         self.current_mode = "week"
@@ -143,31 +167,13 @@ class OverviewWidget(QWidget):
         self.load_data_for_current_mode()
 
     def on_prev_clicked(self):
-        if self.current_mode == "week":
-            self.current_date -= timedelta(days=7)
-        elif self.current_mode == "month":
-            year = self.current_date.year
-            month = self.current_date.month - 1
-            if month < 1:
-                month = 12
-                year -= 1
-            self.current_date = self.current_date.replace(year=year, month=month, day=1)
-        else:
-            self.current_date -= timedelta(days=1)
+        self.last_step = -1
+        self.current_date = self.shift_date(self.current_date, -1)
         self.load_data_for_current_mode()
 
     def on_next_clicked(self):
-        if self.current_mode == "week":
-            self.current_date += timedelta(days=7)
-        elif self.current_mode == "month":
-            year = self.current_date.year
-            month = self.current_date.month + 1
-            if month > 12:
-                month = 1
-                year += 1
-            self.current_date = self.current_date.replace(year=year, month=month, day=1)
-        else:
-            self.current_date += timedelta(days=1)
+        self.last_step = 1
+        self.current_date = self.shift_date(self.current_date, 1)
         self.load_data_for_current_mode()
 
     @staticmethod
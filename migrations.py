@@ -0,0 +1,104 @@
+"""Версионные миграции схемы базы данных.
+
+Номер последней применённой миграции хранится в PRAGMA user_version файла SQLite.
+Новые таблицы и индексы создаёт create_tables (по моделям Base.metadata), а миграции доводят до
+актуального состояния базы, созданные раньше: удаляют дубли, заполняют новые таблицы
+и добавляют индексы к существующим таблицам. Каждый шаг выполняется в своей транзакции
+вместе с обновлением user_version и может безопасно выполняться повторно.
+
+SQL миграций намеренно не зависит от текущих моделей: шаг должен выполняться так же,
+как в момент его появления.
+"""
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+logger = logging.getLogger(__name__)
+
+
+def sales_plan_unique(conn):
+    """Уникальный индекс (plan_date, product_id) в sales_plan для upsert прогноза."""
+    # Из дублей оставляем последнюю запись
+    deleted = conn.execute(text(
+        "DELETE FROM sales_plan WHERE id NOT IN "
+        "(SELECT MAX(id) FROM sales_plan GROUP BY plan_date, product_id)"
+    )).rowcount
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_sales_plan_date_product ON sales_plan (plan_date, product_id)"
+    ))
+    logger.info(f"Уникальный индекс sales_plan создан, удалено дублей: {deleted}")
+
+
+def daily_sales_backfill(conn):
+    """Заполняет дневную сводку daily_sales из истории заказов."""
+    if conn.execute(text("SELECT 1 FROM daily_sales LIMIT 1")).first() is not None:
+        return
+    inserted = conn.execute(text(
+        "INSERT INTO daily_sales (sale_date, product_id, client_id, quantity, revenue) "
+        "SELECT orders.order_date, order_items.product_id, orders.client_id, "
+        "SUM(order_items.quantity), SUM(order_items.quantity * order_items.price) "
+        "FROM orders JOIN order_items ON orders.id = order_items.order_id "
+        "GROUP BY orders.order_date, order_items.product_id, orders.client_id"
+    )).rowcount
+    if inserted:
+        logger.info(f"Таблица daily_sales построена: {inserted} строк")
+
+
+QUERY_INDEXES = [
+    ("ix_orders_date_client", "orders", "order_date, client_id"),
+    ("ix_order_items_order_product", "order_items", "order_id, product_id, quantity, price"),
+    ("ix_order_items_product", "order_items", "product_id"),
+    ("ix_marketing_activities_dates", "marketing_activities", "start_date, end_date"),
+    ("ix_activity_products_activity", "activity_products", "activity_id, product_id"),
+]
+
+
+def query_indexes(conn):
+    """Составные индексы под фильтры по периоду и соединения в отчётах и прогнозе."""
+    for name, table, columns in QUERY_INDEXES:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+    # Статистика для планировщика запросов по новым индексам
+    conn.execute(text("ANALYZE"))
+    logger.info(f"Созданы индексы: {', '.join(name for name, _, _ in QUERY_INDEXES)}")
+
+
+# (номер, описание, шаг); номера только растут, применённые шаги не меняются
+MIGRATIONS = [
+    (1, "уникальный индекс sales_plan", sales_plan_unique),
+    (2, "дневная сводка daily_sales", daily_sales_backfill),
+    (3, "индексы для запросов отчётов и прогноза", query_indexes),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    return conn.execute(text("PRAGMA user_version")).scalar()
+
+
+def create_tables(engine, metadata):
+    """Создаёт недостающие таблицы с их индексами, как create_all, но в постоянном порядке.
+
+    create_all перебирает индексы таблицы в порядке множества, который меняется от запуска
+    к запуску, и файлы баз с одинаковыми данными различались бы побайтно.
+    """
+    with engine.begin() as conn:
+        existing = set(inspect(conn).get_table_names())
+        for table in metadata.sorted_tables:
+            if table.name in existing:
+                continue
+            conn.execute(CreateTable(table))
+            for index in sorted(table.indexes, key=lambda index: index.name):
+                conn.execute(CreateIndex(index))
+
+
+def migrate(engine, metadata):
+    """Создаёт недостающие таблицы и применяет миграции новее user_version базы."""
+    create_tables(engine, metadata)
+    for number, title, step in MIGRATIONS:
+        with engine.begin() as conn:
+            if get_schema_version(conn) >= number:
+                continue
+            logger.info(f"Миграция {number}: {title}")
+            step(conn)
+            conn.execute(text(f"PRAGMA user_version = {number}"))
@@ -0,0 +1,101 @@
+import logging
+import sys
+import threading
+from collections import OrderedDict
+
+from settings import REPORT_CACHE_MB
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_report_size(data):
+    """Приблизительный объём данных отчёта в байтах.
+
+    Размер элементов оценивается по первому элементу столбца.
+    """
+    size = 0
+    for column in data["summary_columns"]:
+        size += sys.getsizeof(column)
+        if len(column):
+            size += sys.getsizeof(column[0]) * len(column)
+    return size
+
+
+class ReportCache:
+    """LRU-кэш построенных отчётов аналитики в памяти.
+
+    Ключ — период (date_from, date_to); вместе с отчётом хранится версия данных периода.
+    Запись с другой версией считается устаревшей. Общий объём записей ограничен max_bytes:
+    при превышении вытесняются давно не использованные отчёты. Доступ потокобезопасен.
+
+    Для отчётов, построенных предвыборкой, считается доля тех, что затем были запрошены.
+    """
+
+    def __init__(self, max_bytes=REPORT_CACHE_MB * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()   # период -> (версия, отчёт, размер)
+        self.prefetched_unused = set()  # периоды, построенные предвыборкой и ещё не запрошенные
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def get(self, period, version):
+        """Возвращает отчёт за период, если он построен по данным той же версии, иначе None."""
+        with self.lock:
+            entry = self.entries.get(period)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(period)
+            self.hits += 1
+            if period in self.prefetched_unused:
+                self.prefetched_unused.discard(period)
+                self.prefetch_hits += 1
+            return entry[1]
+
+    def contains(self, period, version):
+        """Есть ли отчёт за период нужной версии; не влияет на статистику и порядок вытеснения."""
+        with self.lock:
+            entry = self.entries.get(period)
+            return entry is not None and entry[0] == version
+
+    def put(self, period, version, data, prefetched=False):
+        size = estimate_report_size(data)
+        with self.lock:
+            old = self.entries.pop(period, None)
+            if old is not None:
+                self.total_bytes -= old[2]
+            self.prefetched_unused.discard(period)
+            if size > self.max_bytes:
+                logger.debug(f"Кэш отчётов: отчёт за {period} ({size / 2 ** 20:.1f} МБ) больше предела кэша")
+                return
+            self.entries[period] = (version, data, size)
+            self.total_bytes += size
+            if prefetched:
+                self.prefetched += 1
+                self.prefetched_unused.add(period)
+            while self.total_bytes > self.max_bytes:
+                evicted_period, (_, _, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                self.prefetched_unused.discard(evicted_period)
+                self.evictions += 1
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.prefetched = 0
+        self.prefetch_hits = 0
+
+    @property
+    def prefetch_hit_rate(self):
+        """Доля отчётов предвыборки, которые пользователь затем открыл."""
+        return self.prefetch_hits / self.prefetched if self.prefetched else 0.0
+
+    def log_stats(self):
+        logger.info(
+            f"Кэш отчётов: попаданий {self.hits}, промахов {self.misses}, вытеснений {self.evictions}, "
+            f"{len(self.entries)} отчётов, {self.total_bytes / 2 ** 20:.1f} МБ; "
+            f"предвыборка: построено {self.prefetched}, использовано {self.prefetch_hits} "
+            f"({self.prefetch_hit_rate:.0%})"
+        )
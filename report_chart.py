@@ -0,0 +1,109 @@
+import matplotlib.dates as mdates
+import numpy as np
+from matplotlib.ticker import FuncFormatter
+
+# При большем числе точек маркеры сливаются в сплошную линию и не рисуются
+MARKER_LIMIT = 90
+
+
+def downsample_minmax(x, y, max_points):
+    """Прореживает ряд до max_points точек, сохраняя минимум и максимум каждого интервала.
+
+    Ряд делится на max_points // 2 равных по числу точек интервалов; из каждого берутся
+    точки минимума и максимума в исходном порядке, поэтому пики не теряются.
+    """
+    n = len(y)
+    buckets = max_points // 2
+    if n <= max_points or buckets < 1:
+        return x, y
+    size = -(-n // buckets)
+    buckets = -(-n // size)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    idx = np.unique(np.concatenate([
+        offsets + np.nanargmin(padded, axis=1),
+        offsets + np.nanargmax(padded, axis=1),
+    ]))
+    return x[idx], y[idx]
+
+
+class ReportChart:
+    """График отчёта аналитики: продажи, прогноз и план по датам.
+
+    Оси и линии создаются один раз; при обновлении меняются только данные линий
+    (set_data) и пределы осей, а холст перерисовывается через draw_idle. Ось X — даты,
+    длинные ряды прореживаются до ширины холста в пикселях.
+    """
+
+    def __init__(self, figure, canvas):
+        self.figure = figure
+        self.canvas = canvas
+        self.series = {}   # имя ряда -> (x, y) исходные данные
+        self.ax = figure.add_subplot(111)
+        ax = self.ax
+
+        self.lines = {
+            "totals": ax.plot([], [], color="#80cbc4", linewidth=1.8, drawstyle="steps-mid",
+                              label="Продажи (₽)")[0],
+            "forecast": ax.plot([], [], color="#004d40", linestyle="--", linewidth=2, marker='s', markersize=3,
+                                label="Прогноз спроса (₽)")[0],
+            "plan": ax.plot([], [], color="#26a69a", linestyle="-.", linewidth=2, marker='^', markersize=3,
+                            label="План продаж (₽)")[0],
+        }
+        self.markers = {name: line.get_marker() for name, line in self.lines.items()}
+
+        locator = mdates.AutoDateLocator()
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+        # Форматирование оси Y
+        ax.yaxis.set_major_formatter(FuncFormatter(lambda x, _: f'{x:.2f}'))
+
+        ax.set_title("Сумма продаж, прогноз и план", fontsize=11, color="#004d40", fontweight='bold')
+        ax.tick_params(axis='x', labelsize=7, colors="#004d40")
+        ax.tick_params(axis='y', labelsize=7, colors="#004d40")
+        ax.legend(facecolor='white', edgecolor='lightgray', fontsize=8)
+        ax.grid(True, linestyle='--', alpha=0.5)
+        for spine in ax.spines.values():
+            spine.set_edgecolor("#26a69a")
+        self.figure.tight_layout()
+
+        self.canvas.mpl_connect("resize_event", self.on_resize)
+
+    def max_points(self):
+        """Число точек, различимых по ширине холста (две на пиксель: минимум и максимум)."""
+        return max(2 * self.canvas.width(), 2)
+
+    def update(self, dates, totals, forecast_values, plan_values):
+        """Обновляет ряды графика; неизменившиеся ряды и холст не перерисовываются."""
+        x = mdates.date2num(np.asarray(dates, dtype="datetime64[D]")) if len(dates) else np.empty(0)
+        changed = False
+        for name, values in (("totals", totals), ("forecast", forecast_values), ("plan", plan_values)):
+            y = np.asarray(values, dtype=float)
+            old = self.series.get(name)
+            if old is not None and np.array_equal(old[0], x) and np.array_equal(old[1], y):
+                continue
+            self.series[name] = (x, y)
+            self.set_line_data(name)
+            changed = True
+        if changed:
+            self.rescale()
+
+    def set_line_data(self, name):
+        x, y = self.series[name]
+        line = self.lines[name]
+        line.set_data(*downsample_minmax(x, y, self.max_points()))
+        line.set_marker(self.markers[name] if len(y) <= MARKER_LIMIT else "None")
+
+    def rescale(self):
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.canvas.draw_idle()
+
+    def on_resize(self, event):
+        # Прореживание зависит от ширины холста
+        for name in self.series:
+            self.set_line_data(name)
+        self.figure.tight_layout()
+        self.canvas.draw_idle()
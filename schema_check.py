@@ -0,0 +1,104 @@
+"""Проверка планов запросов отчётов и прогноза.
+
+Для каждого запроса выполняется EXPLAIN QUERY PLAN; проверка не проходит, если SQLite
+читает какую-либо таблицу полным просмотром (SCAN) вместо поиска по индексу.
+
+Пример запуска:
+    python schema_check.py --db pm_demo.db
+"""
+import argparse
+import logging
+import sys
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from analytics_service import (
+    sales_details_query, plan_totals_query, data_version_query, daily_totals_query, product_totals_query,
+    client_sales_query
+)
+from data_simulator import Base
+from forecast_service import (
+    sales_matrix_query, client_activity_query, sales_watermarks_query, marketing_activities_query,
+    sales_plan_keys_query
+)
+from migrations import migrate
+
+logger = logging.getLogger("schema_check")
+
+
+class QueryPlanError(Exception):
+    """Запрос читает таблицу полным просмотром."""
+
+
+def checked_queries(session, today=None):
+    """Запросы отчётов и прогноза с типичными параметрами: {название: Query}."""
+    today = today or date.today()
+    month_ago = today - timedelta(days=30)
+    year_ago = today - timedelta(days=365)
+    return {
+        "отчёт: продажи": sales_details_query(session, month_ago, today),
+        "отчёт: прогноз и план": plan_totals_query(session, month_ago, today),
+        "отчёт: версия данных": data_version_query(session, month_ago, today),
+        "детализация: дни": daily_totals_query(session, month_ago, today, after=month_ago).limit(200),
+        "детализация: продукты": product_totals_query(session, today, after=1).limit(200),
+        "детализация: клиенты": client_sales_query(session, today, 1, after=1).limit(200),
+        "прогноз: матрица продаж": sales_matrix_query(session, year_ago, today),
+        "прогноз: активность клиентов": client_activity_query(session, month_ago, today),
+        "прогноз: водяные знаки моделей": sales_watermarks_query(session, year_ago, today),
+        "прогноз: маркетинговые акции": marketing_activities_query(session, today, today + timedelta(days=30)),
+        "сохранение плана": sales_plan_keys_query(session, today, today + timedelta(days=30)),
+    }
+
+
+def explain(session, query):
+    """Возвращает строки EXPLAIN QUERY PLAN для запроса."""
+    compiled = query.statement.compile(dialect=session.bind.dialect, compile_kwargs={"literal_binds": True})
+    return [row.detail for row in session.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))]
+
+
+def full_scans(plan):
+    # «SCAN CONSTANT ROW» и просмотр подзапросов не читают таблиц
+    return [
+        detail for detail in plan
+        if detail.startswith("SCAN ") and not detail.startswith(("SCAN CONSTANT ROW", "SCAN SUBQUERY"))
+    ]
+
+
+def check_query_plans(session):
+    """Проверяет планы всех запросов; при полных просмотрах таблиц выбрасывает QueryPlanError."""
+    failures = []
+    for name, query in checked_queries(session).items():
+        plan = explain(session, query)
+        scans = full_scans(plan)
+        logger.info(f"{name}: {'; '.join(plan)}")
+        if scans:
+            failures.append(f"{name}: {', '.join(scans)}")
+    if failures:
+        raise QueryPlanError("Полный просмотр таблиц в запросах:\n" + "\n".join(failures))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Проверка планов запросов отчётов и прогноза")
+    parser.add_argument("--db", default="pm_demo.db", help="файл базы данных SQLite")
+    args = parser.parse_args(argv)
+
+    engine = create_engine(f"sqlite:///{args.db}", echo=False)
+    migrate(engine, Base.metadata)
+    session = sessionmaker(bind=engine)()
+    try:
+        check_query_plans(session)
+    except QueryPlanError as e:
+        logger.error(str(e))
+        return 1
+    finally:
+        session.close()
+        engine.dispose()
+    logger.info("Все запросы используют индексы")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(main())
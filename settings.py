@@ -0,0 +1,45 @@
+import os
+
+# Настройки приложения (значения можно переопределить переменными окружения)
+
+# Число процессов для параллельного обучения моделей прогноза (1 — последовательно)
+FORECAST_WORKERS = int(os.environ.get("PM_FORECAST_WORKERS", os.cpu_count() or 1))
+
+# Каталог дискового кэша обученных моделей прогноза
+MODEL_CACHE_DIR = os.environ.get("PM_MODEL_CACHE_DIR", "forecast_cache")
+
+# Модель прогноза по умолчанию: "prophet" (точная) или "holt_winters" (быстрая пакетная)
+FORECAST_ENGINE = os.environ.get("PM_FORECAST_ENGINE", "prophet")
+
+# Уровень иерархического прогноза: "" (по продуктам), "category" или "brand"
+FORECAST_HIERARCHY = os.environ.get("PM_FORECAST_HIERARCHY", "")
+
+# Предельный размер кэша отчётов аналитики в памяти, МБ
+REPORT_CACHE_MB = int(os.environ.get("PM_REPORT_CACHE_MB", 64))
+
+# Запускать симулятор данных (новые заказы, запасы, акции) вместе с интерфейсом: "1" — да
+SIMULATE = os.environ.get("PM_SIMULATE", "0") == "1"
+
+# Источник сумм продаж для отчётов аналитики: "sql" (запросы к базе) или "memory"
+# (колоночный движок в памяти с накопленными суммами)
+ANALYTICS_BACKEND = os.environ.get("PM_ANALYTICS_BACKEND", "sql")
+
+# Режим симулятора: 0 — дополнять сегодняшние заказы до 10 (DataSimulator), иначе целевая
+# скорость генератора нагрузки в заказах в секунду (LoadGenerator)
+SIMULATE_RATE = float(os.environ.get("PM_SIMULATE_RATE", 0))
+
+# Профиль нагрузки генератора: "steady", "burst" или "wave"
+SIMULATE_PROFILE = os.environ.get("PM_SIMULATE_PROFILE", "steady")
+
+# База данных приложения
+DATABASE_URL = os.environ.get("PM_DATABASE_URL", "sqlite:///pm_demo.db")
+
+# Сколько ждать снятия блокировки базы другим соединением, мс
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("PM_DB_BUSY_TIMEOUT_MS", 5000))
+
+# Кэш страниц SQLite на соединение и размер отображения файла базы в память, МБ
+DB_CACHE_MB = int(os.environ.get("PM_DB_CACHE_MB", 64))
+DB_MMAP_MB = int(os.environ.get("PM_DB_MMAP_MB", 256))
+
+# Как часто изменения данных от симулятора доставляются виджетам одной пачкой, мс
+CHANGE_FEED_INTERVAL_MS = int(os.environ.get("PM_CHANGE_FEED_INTERVAL_MS", 1000))
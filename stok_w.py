@@ -55,6 +55,8 @@ class StokWidget(QWidget):
         today = datetime.today().date()
         products.sort(key=lambda p: p.shelf_life)
 
+        self.info_labels = {}
+        self.products = {}
         for product in products:
             frame = QFrame()
             frame.setFrameShape(QFrame.Shape.StyledPanel)
@@ -65,19 +67,31 @@ class StokWidget(QWidget):
             name_label.setFixedWidth(150)
             hbox.addWidget(name_label)
 
-            info = f"""
-                Тип: {product.category} |
-                Цена: {product.price} ₽ |
-                Остаток: {product.stock_quantity} |
-                Срок годности: {product.shelf_life} дн.
-            """
-            info_label = QLabel(info)
+            info_label = QLabel(self.product_info(product, product.stock_quantity))
             hbox.addWidget(info_label)
+            self.info_labels[product.id] = info_label
+            self.products[product.id] = product
 
             self.scroll_layout.addWidget(frame)
 
         self.scroll_layout.addStretch()
 
+    @staticmethod
+    def product_info(product, stock_quantity):
+        return f"""
+                Тип: {product.category} |
+                Цена: {product.price} ₽ |
+                Остаток: {stock_quantity} |
+                Срок годности: {product.shelf_life} дн.
+            """
+
+    def apply_changes(self, batch):
+        """Обновляет остатки продуктов, изменившиеся в пачке изменений (ChangeBatch)."""
+        for product_id, change in batch.stock.items():
+            label = self.info_labels.get(product_id)
+            if label is not None:
+                label.setText(self.product_info(self.products[product_id], change.stock_quantity))
+
     def get_style_for_product(self, product, today):
         if product.shelf_life < 60:
             return """
@@ -0,0 +1,55 @@
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+
+def format_date(value):
+    return value.strftime("%d.%m.%y")
+
+
+def format_money(value):
+    return f"{value:.2f}"
+
+
+def format_percent(value):
+    return f"{value:.2f}%" if isinstance(value, (float, int)) else str(value)
+
+
+class ColumnarTableModel(QAbstractTableModel):
+    """Модель таблицы над данными, хранящимися по столбцам.
+
+    Столбцы — последовательности одинаковой длины (списки, кортежи, массивы NumPy).
+    Строки не материализуются: значение ячейки форматируется в data() только когда
+    представление его отображает, поэтому смена данных сводится к сбросу модели.
+    """
+
+    def __init__(self, headers, formatters=None, parent=None):
+        super().__init__(parent)
+        self.headers = list(headers)
+        self.formatters = list(formatters) if formatters else [str] * len(self.headers)
+        self.columns = [()] * len(self.headers)
+        self.row_count = 0
+
+    def set_columns(self, columns):
+        """Заменяет данные модели; представления перечитывают только видимые ячейки."""
+        self.beginResetModel()
+        self.columns = list(columns)
+        self.row_count = len(self.columns[0]) if self.columns else 0
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        col = index.column()
+        return self.formatters[col](self.columns[col][index.row()])
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.headers[section]
+        return str(section + 1)